@@ -1,9 +1,17 @@
+import json
+import os
+import tempfile
+from contextlib import ExitStack
 import streamlit as st
 import pandas as pd
-from src.pdf_parser import extract_text_from_pdf_or_text
-from src.fee_detector import detect_fees_in_text
+from src.cache import ResultCache, content_digest, extract_and_detect, extract_and_detect_many, result_key
+from src.tracing import tracing
 from src.costs import annualize_fees
-from src.summarizer import render_fee_nutrition_label, draft_complaint_email, llm_summary
+from src.fee_batch import FeeBatch
+from src.history import session_history
+from src.layouts import LayoutStore
+from src.llm import ResponseCache
+from src.summarizer import FeeReport, render_fee_nutrition_label, draft_complaint_email, llm_summary
 
 # Page configuration
 st.set_page_config(
@@ -13,6 +21,425 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Process-wide cache of parsed statements, shared by every session.
+
+    Set FINFEEX_CACHE_DIR to also keep results on disk between restarts.
+    """
+    return ResultCache(cache_dir=os.environ.get("FINFEEX_CACHE_DIR"))
+
+
+@st.cache_resource
+def get_llm_cache() -> ResponseCache:
+    """AI summaries by prompt hash, so asking twice for the same statement is free."""
+    return ResponseCache(max_entries=256, ttl=24 * 3600)
+
+
+@st.cache_resource
+def get_layout_store():
+    """Learned bank layouts, if FINFEEX_LAYOUTS names the JSON file to keep them in."""
+    path = os.environ.get("FINFEEX_LAYOUTS")
+    return LayoutStore(path) if path else None
+
+
+# Worker processes used to parse a multi-file upload (FINFEEX_PARSE_WORKERS overrides)
+PARSE_WORKERS = int(os.environ.get("FINFEEX_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+# The page flow is split into memoized stages so a rerun only recomputes what
+# its inputs changed: parsing depends on the file alone, annualization and the
+# table built from it on the file and est_txns (st.cache_data; underscore
+# arguments are not hashed). Every stage is keyed by the upload's result_key
+# (content digest plus extension and extraction options), not the bare
+# digest, as the same bytes may parse differently as .csv and .txt. Totals,
+# score, top fees and the label come from one shared FeeReport per analysis.
+
+def upload_digest(uploaded) -> str:
+    """Content digest of an upload, hashed once per uploaded file."""
+    digests = st.session_state.setdefault('upload_digests', {})
+    key = getattr(uploaded, 'file_id', None)
+    if key is None or key not in digests:
+        digest = content_digest(uploaded.getvalue())
+        if key is None:
+            return digest
+        digests[key] = digest
+    return digests[key]
+
+
+def upload_key(uploaded, digest: str) -> str:
+    """Stage key of an upload: its :func:`result_key` with the app's extraction options."""
+    return result_key(digest, get_layout_store(), filename=uploaded.name)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def parse_stage(key: str, _digest: str, _uploaded):
+    """Extracted text and fee candidates for an upload (parsed at most once)."""
+    _, text, fees = extract_and_detect(_uploaded.getvalue(), get_result_cache(), digest=_digest,
+                                       layouts=get_layout_store(), filename=_uploaded.name)
+    return text, fees
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def annualize_stage(key: str, est_txns: int, _fees) -> FeeBatch:
+    return annualize_fees(FeeBatch.from_records(_fees), estimated_annual_txns=est_txns)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def report_stage(key: str, est_txns: int, _batch: FeeBatch) -> FeeReport:
+    """The analysis's FeeReport, shared (not copied) so each derived view is computed once."""
+    return FeeReport(_batch)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def breakdown_table_stage(key: str, est_txns: int, _df: pd.DataFrame) -> pd.DataFrame:
+    """Formatted copy of the annualized fees for the breakdown table."""
+    display_df = _df.copy()
+    if 'annual_cost_estimate' in display_df.columns:
+        display_df['Annual Cost'] = display_df['annual_cost_estimate'].apply(
+            lambda x: f"₹{int(x):,}" if pd.notna(x) else "—"
+        )
+    if 'value' in display_df.columns:
+        def fmt_val(r):
+            if r['type'] == 'percent':
+                return f"{r['value']}%"
+            if pd.isna(r['value']):
+                return "—"
+            return f"₹{int(r['value']):,}"
+        display_df['Detected Value'] = display_df.apply(fmt_val, axis=1)
+        display_df = display_df.rename(columns={
+            'line': 'Fee Description',
+            'frequency': 'Frequency',
+            'category': 'Category'
+        })
+        # Include category in display
+        cols = ['Category', 'Fee Description', 'Detected Value', 'Frequency', 'Annual Cost']
+        display_df = display_df[[c for c in cols if c in display_df.columns]]
+    return display_df
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def email_stage(key: str, est_txns: int, _report: FeeReport) -> str:
+    return draft_complaint_email(_report)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def csv_report_stage(key: str, est_txns: int, _df: pd.DataFrame) -> bytes:
+    return _df.to_csv(index=False).encode('utf-8')
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def json_report_stage(key: str, est_txns: int, _report: FeeReport) -> bytes:
+    json_payload = {
+        'summary': render_fee_nutrition_label(_report),
+        'detected_fees': _report.df.to_dict(orient='records')
+    }
+    return json.dumps(json_payload, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def lazy_download_button(label: str, build, key: str, **kwargs):
+    """Download button whose payload is only built once the user asks for it.
+
+    The first click on the plain button flags the payload as requested; the
+    enclosing fragment's rerun then builds it with ``build()`` and shows the
+    real download button in its place.
+    """
+    if st.session_state.get(key):
+        st.download_button(label=label, data=build(), on_click='ignore', width='stretch', **kwargs)
+    else:
+        st.button(label, key=f'prepare_{key}', help=kwargs.get('help'), width='stretch',
+                  on_click=st.session_state.__setitem__, args=(key, True))
+
+
+def analyze_uploads(files, est_txns: int):
+    """Parse several uploads on a process pool, showing each file's results as it finishes.
+
+    Returns the file picked for the full results view, or None.
+    """
+    by_digest = {}
+    for f in files:
+        by_digest.setdefault(upload_digest(f), []).append(f)
+
+    st.markdown(f"### 📚 Analyzing {len(files)} Statements")
+    progress = st.progress(0.0, text="🔍 Reading your statements...")
+    summary = []
+    results = extract_and_detect_many(((d, fs[0].getvalue(), fs[0].name) for d, fs in by_digest.items()),
+                                      get_result_cache(), workers=PARSE_WORKERS, layouts=get_layout_store())
+    for done, (digest, text, fees, error) in enumerate(results, start=1):
+        names = ", ".join(f.name for f in by_digest[digest])
+        progress.progress(done / len(by_digest), text=f"✅ {done} of {len(by_digest)} analyzed — {names}")
+        if error is not None:
+            st.error(f"❌ Couldn't read **{names}**: {error}")
+            continue
+
+        key = upload_key(by_digest[digest][0], digest)
+        batch = annualize_stage(key, est_txns, fees)
+        history.add_statement(by_digest[digest][0].name, batch, digest=digest)
+        report = report_stage(key, est_txns, batch)
+        df = report.df
+        summary.append({'Statement': names, 'Fees Found': report.count, 'Annual Cost': report.total})
+        with st.expander(f"📄 {names} — {report.count} fee(s), ₹{report.total:,}/year"):
+            if df.empty:
+                st.success("🎉 No hidden fees found in this statement.")
+            else:
+                cols = [c for c in ('category', 'line', 'frequency', 'annual_cost_estimate') if c in df.columns]
+                st.dataframe(df[cols], hide_index=True, width='stretch')
+    progress.progress(1.0, text=f"🎉 All {len(by_digest)} statement(s) analyzed")
+
+    if summary:
+        summary_df = pd.DataFrame(summary).sort_values('Annual Cost', ascending=False)
+        st.dataframe(summary_df, hide_index=True, width='stretch',
+                     column_config={'Annual Cost': st.column_config.NumberColumn(format="₹%.0f")})
+        st.info("🔄 Visit the **Comparison** page to compare these statements side by side.")
+
+    names = [f.name for f in files]
+    choice = st.selectbox("🔍 Show the full analysis for", names, index=None,
+                          placeholder="Pick a statement")
+    return files[names.index(choice)] if choice is not None else None
+
+
+# Results page sections. Each one is a fragment, so a widget inside it (the
+# "Select All Text" button, the API key field, an export button) reruns only
+# that section instead of the whole script.
+
+@st.fragment
+def render_metrics(report: FeeReport):
+    # Key metrics with context
+    if report.count:
+        st.markdown("### 💡 Here's What We Found")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        total_annual = report.total
+        fee_count = report.count
+        score = report.score
+        avg_fee = report.average
+        
+        with col1:
+            st.metric(
+                "💸 You're Paying",
+                f"₹{total_annual:,}/year",
+                help="This is what these fees cost you annually. Imagine what you could do with this money!"
+            )
+        
+        with col2:
+            delta_text = "Good" if score >= 80 else "Fair" if score >= 60 else "Poor"
+            delta_color = "normal" if score >= 60 else "inverse"
+            st.metric(
+                "🎯 Transparency",
+                f"{score}%",
+                delta=delta_text,
+                delta_color=delta_color,
+                help="How transparent your bank is being. Higher is better!"
+            )
+        
+        with col3:
+            st.metric(
+                "🔍 Fees Found",
+                f"{fee_count}",
+                help="Number of separate fees we detected. More fees = more places to save!"
+            )
+        
+        with col4:
+            st.metric(
+                "📈 Average Fee",
+                f"₹{avg_fee:,}/year",
+                help="Average cost per fee annually"
+            )
+        
+        # Emotional context based on total
+        if total_annual > 2000:
+            st.error("😱 **Wow, that's a lot!** You're paying over ₹2,000 in fees annually. Let's see if we can help you reduce this.")
+        elif total_annual > 1000:
+            st.warning("🤔 **That adds up!** Over ₹1,000 per year in fees. Worth reviewing if you can reduce these.")
+        elif total_annual > 500:
+            st.info("💡 **Moderate fees detected.** Not terrible, but there might be room for savings.")
+        else:
+            st.success("🎉 **Good news!** Your fees are relatively low. But every rupee saved is a rupee earned!")
+
+
+@st.fragment
+def render_breakdown(df: pd.DataFrame, key: str, est_txns: int):
+    # Detailed fee breakdown
+    st.markdown("### 📋 Detailed Fee Breakdown")
+    
+    if not df.empty:
+        display_df = breakdown_table_stage(key, est_txns, df)
+        
+        # Use dataframe instead of table for better interactivity
+        st.dataframe(display_df, width='stretch', hide_index=True)
+    else:
+        # Celebratory empty state
+        st.markdown("""
+        <div class="info-card" style="text-align: center; padding: 3rem;">
+        <h2>🎉 Fantastic News!</h2>
+        <p style="font-size: 1.2rem; margin-top: 1rem;">We didn't find any obvious fees in this statement.</p>
+        <p style="color: #666; margin-top: 1rem;">This could mean:</p>
+        <ul style="text-align: left; display: inline-block; margin-top: 1rem;">
+        <li>✅ Your bank is being transparent</li>
+        <li>✅ You have a zero-fee account</li>
+        <li>✅ Fees might be on a different statement</li>
+        </ul>
+        <p style="margin-top: 2rem; color: #666;"><em>Try analyzing more statements to get the full picture!</em></p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+@st.fragment
+def render_visualizations(report: FeeReport):
+    # Visualization section
+    if report.count:
+        st.markdown("---")
+        st.markdown("### 📊 Visual Analysis")
+        
+        viz_col1, viz_col2 = st.columns([2, 1])
+        
+        with viz_col1:
+            viz = report.top(5)
+            if not viz.empty:
+                st.markdown("#### 🔝 Top 5 Annual Fees")
+                # Create a better formatted chart
+                chart_data = viz.set_index('line')['annual_cost_estimate']
+                st.bar_chart(chart_data, width='stretch')
+                st.caption("💡 These are your biggest fee sources")
+        
+        with viz_col2:
+            st.markdown("#### 📄 Fee Nutrition Label")
+            label = render_fee_nutrition_label(report)
+            st.markdown(label)
+
+
+@st.fragment
+def render_email(report: FeeReport, key: str, est_txns: int):
+    # Complaint email section
+    st.markdown("---")
+    st.markdown("### 📧 Ready to Fight Back?")
+    st.markdown("<p class='subtitle'>We've drafted a professional email for you. All you need to do is personalize it and hit send!</p>", unsafe_allow_html=True)
+    
+    tab1, tab2 = st.tabs(["📝 Email Draft", "💡 Pro Tips"])
+    
+    with tab1:
+        email = email_stage(key, est_txns, report)
+        st.markdown("**Your personalized complaint email:**")
+        st.text_area(
+            "Click inside to select all (Ctrl+A), then copy (Ctrl+C):",
+            value=email,
+            height=300,
+            help="Feel free to modify this - make it yours!",
+            label_visibility="collapsed"
+        )
+        
+        # Helpful reminder
+        st.info("💡 **Pro tip:** Don't forget to replace [Your name] and add your account details before sending!")
+        
+        # Quick copy button effect
+        col_a, col_b, col_c = st.columns([1, 2, 1])
+        with col_b:
+            if st.button("📋 Select All Text"):
+                st.toast("✅ Text ready! Press Ctrl+A then Ctrl+C to copy", icon="📋")
+    
+    with tab2:
+        st.markdown("""
+        <div class="info-card">
+        <h4>📝 Before You Send</h4>
+        <ul>
+        <li>✅ <strong>Personalize it:</strong> Replace [Your name] and contact details</li>
+        <li>✅ <strong>Add specifics:</strong> Include your account number and customer ID</li>
+        <li>✅ <strong>Attach proof:</strong> Download the CSV report below and attach it</li>
+        <li>✅ <strong>Stay professional:</strong> Firm but polite gets better results</li>
+        <li>✅ <strong>Follow through:</strong> Set a reminder to follow up in 14 days</li>
+        </ul>
+        </div>
+        
+        <div class="info-card" style="margin-top: 1rem;">
+        <h4>⚖️ Know Your Rights</h4>
+        <ul>
+        <li>🛡️ Banks <strong>must</strong> disclose all fees clearly (RBI guidelines)</li>
+        <li>💰 You <strong>can</strong> request refunds for unauthorized charges</li>
+        <li>🚪 You <strong>have the right</strong> to close accounts without penalties</li>
+        <li>📞 Contact RBI Banking Ombudsman if bank doesn't respond</li>
+        </ul>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+@st.fragment
+def render_exports(report: FeeReport, key: str, est_txns: int):
+    # Export and download section
+    st.markdown("---")
+    st.markdown("### 📥 Take This With You")
+    st.markdown("<p class='subtitle'>Save your analysis and use it as evidence when contacting your bank.</p>", unsafe_allow_html=True)
+    
+    col_d1, col_d2, col_d3 = st.columns(3)
+    
+    with col_d1:
+        lazy_download_button(
+            label='📊 CSV Report',
+            build=lambda: csv_report_stage(key, est_txns, report.df),
+            key=f'csv_{key}_{est_txns}',
+            file_name='finfeex_report.csv',
+            mime='text/csv',
+            help='Download as Excel/Sheets-friendly format'
+        )
+        st.caption("📈 Open in Excel")
+    
+    with col_d2:
+        from datetime import datetime
+        lazy_download_button(
+            label='📄 JSON Report',
+            build=lambda: json_report_stage(key, est_txns, report),
+            key=f'json_{key}_{est_txns}',
+            file_name=f'finfeex_report_{datetime.now().strftime("%Y%m%d")}.json',
+            mime='application/json',
+            help='Download as structured data format'
+        )
+        st.caption("🔧 For developers")
+    
+    with col_d3:
+        lazy_download_button(
+            label='📧 Email Draft',
+            build=lambda: email_stage(key, est_txns, report).encode('utf-8'),
+            key=f'email_{key}_{est_txns}',
+            file_name='complaint_email.txt',
+            mime='text/plain',
+            help='Download ready-to-send email template'
+        )
+        st.caption("✍️ Ready to send")
+
+
+@st.fragment
+def render_ai_insights(report: FeeReport):
+    # LLM Summary section (optional advanced feature)
+    st.markdown("---")
+    with st.expander("🤖 Want Even Deeper Insights? (AI-Powered)"):
+        st.markdown("""
+        <div class="info-card">
+        <p>Use OpenAI's AI to get personalized recommendations and strategies to reduce your fees.</p>
+        <p><strong>Note:</strong> Requires your own OpenAI API key (not stored, used only for this session).
+        Only the detected fees are sent, never the full statement.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        api_key = st.text_input(
+            '🔑 OpenAI API Key',
+            type='password',
+            help="Get your API key from platform.openai.com. It's not stored anywhere.",
+            placeholder="sk-..."
+        )
+        
+        if api_key:
+            if st.button('✨ Generate Personalized AI Insights', type='primary'):
+                with st.spinner('🧠 AI is analyzing your fees and finding savings opportunities...'):
+                    try:
+                        llm_out = llm_summary(report, openai_api_key=api_key, cache=get_llm_cache())
+                        st.markdown("#### 🎯 Your Personalized Insights")
+                        st.success(llm_out)
+                    except Exception as e:
+                        st.error(f"❌ Oops! Something went wrong: {str(e)}")
+                        st.info("💡 Make sure your API key is valid and has credits available.")
+
+
 # Custom CSS for human-centered design
 st.markdown("""
 <style>
@@ -220,6 +647,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Analyzed statements with pre-computed totals (see src/history.py)
+history = session_history(st.session_state)
+
 # Sidebar with human-centered design
 with st.sidebar:
     st.image("https://img.icons8.com/clouds/200/money-box.png", width=120)
@@ -244,15 +674,11 @@ with st.sidebar:
     st.markdown("---")
     
     # Progress tracker
-    if 'fee_history' in st.session_state and len(st.session_state.fee_history) > 0:
+    overall = history.overall()
+    if overall['statements'] > 0:
         st.markdown("### 🎯 Your Progress")
-        st.success(f"✅ {len(st.session_state.fee_history)} statement(s) analyzed")
-        
-        total_fees = sum(
-            sum(f.get('annual_cost_estimate', 0) for f in entry['fees'])
-            for entry in st.session_state.fee_history
-        )
-        st.metric("Total Fees Found", f"₹{int(total_fees):,}")
+        st.success(f"✅ {overall['statements']} statement(s) analyzed")
+        st.metric("Total Fees Found", f"₹{int(overall['total']):,}")
         
         if st.button("🔄 Analyze Another"):
             st.info("👆 Upload a new statement above")
@@ -282,6 +708,19 @@ with st.sidebar:
         - 🔥 Always Free
         """)
     
+    with st.expander("🛠️ Debug"):
+        debug_timings = st.checkbox(
+            "⏱️ Show pipeline timings",
+            value=False,
+            help="Time extraction, detection, annualization and rendering for this run"
+        )
+        profile_run = st.checkbox(
+            "🧪 Capture cProfile",
+            value=False,
+            help="Profile this run and download the .prof file (open it with snakeviz or flameprof)"
+        )
+    debug_panel = st.container()
+    
     st.markdown("---")
     st.caption("🌟 Made with ❤️ for financial transparency")
 
@@ -290,8 +729,6 @@ st.markdown('<div class="main-header">💰 FinFeeX — Hidden-Fees X-Ray</div>',
 st.markdown('<div class="subtitle">🕵️ Discover what your bank isn\'t telling you. Upload your statement and we\'ll find every hidden fee.</div>', unsafe_allow_html=True)
 
 # Initialize session state for analytics
-if 'fee_history' not in st.session_state:
-    st.session_state.fee_history = []
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 1
 
@@ -325,10 +762,12 @@ st.markdown("### 👋 Let's Start Finding Your Hidden Fees")
 col_intro1, col_intro2 = st.columns([3, 2])
 
 with col_intro1:
-    uploaded = st.file_uploader(
-        "Drop your bank or credit card statement here",
-        type=["pdf", "txt"],
-        help="🔒 Your data stays private. We process everything locally and never store your information."
+    uploaded_files = st.file_uploader(
+        "Drop your bank or credit card statements here",
+        type=["pdf", "txt", "csv", "ofx", "qfx"],
+        accept_multiple_files=True,
+        help="🔒 Your data stays private. We process everything locally and never store your information. "
+             "Drop several statements at once to analyze them side by side."
     )
     
 with col_intro2:
@@ -342,365 +781,146 @@ with col_intro2:
     </div>
     """, unsafe_allow_html=True)
 
-if uploaded is not None:
-    st.session_state.current_step = 2
-    
-    # Processing section with personality
-    with st.spinner("🔍 Reading your statement... Looking for sneaky fees..."):
-        text = extract_text_from_pdf_or_text(uploaded)
-    
-    st.session_state.current_step = 3
-    st.markdown('<div class="success-banner">✅ Got it! We found your statement. Now let\'s see what they\'re charging you...</div>', unsafe_allow_html=True)
-    
-    # Show extracted text in expander (optional)
-    if show_raw_text:
-        with st.expander("📄 View Extracted Text (First 800 chars)"):
-            st.text_area("Extracted content", value=(text[:800] + "..." if len(text) > 800 else text), height=200, disabled=True)
-    
-    # Process fees
-    fees = detect_fees_in_text(text)
-    df = annualize_fees(fees, estimated_annual_txns=est_txns)
-    
-    # Add to history for analytics (only if not already added)
-    statement_name = uploaded.name
-    if not any(h['name'] == statement_name for h in st.session_state.fee_history):
-        from datetime import datetime
-        st.session_state.fee_history.append({
-            'name': statement_name,
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'fees': df.to_dict('records')
-        })
-    
-    # Show analytics link
-    if len(st.session_state.fee_history) > 0:
-        st.info(f"📊 {len(st.session_state.fee_history)} statement(s) tracked. Visit the **Analytics** page to see trends and comparisons!")
-    
-    # Key metrics with context
-    if not df.empty:
-        st.markdown("### 💡 Here's What We Found")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        total_annual = int(df['annual_cost_estimate'].dropna().sum()) if 'annual_cost_estimate' in df.columns else 0
-        fee_count = len(df)
-        score = 100 - min(80, int(total_annual / 20))
-        avg_fee = int(total_annual / fee_count) if fee_count > 0 else 0
-        
-        with col1:
-            st.metric(
-                "💸 You're Paying",
-                f"₹{total_annual:,}/year",
-                help="This is what these fees cost you annually. Imagine what you could do with this money!"
-            )
-        
-        with col2:
-            delta_text = "Good" if score >= 80 else "Fair" if score >= 60 else "Poor"
-            delta_color = "normal" if score >= 60 else "inverse"
-            st.metric(
-                "🎯 Transparency",
-                f"{score}%",
-                delta=delta_text,
-                delta_color=delta_color,
-                help="How transparent your bank is being. Higher is better!"
-            )
-        
-        with col3:
-            st.metric(
-                "🔍 Fees Found",
-                f"{fee_count}",
-                help="Number of separate fees we detected. More fees = more places to save!"
-            )
-        
-        with col4:
-            st.metric(
-                "📈 Average Fee",
-                f"₹{avg_fee:,}/year",
-                help="Average cost per fee annually"
-            )
-        
-        # Emotional context based on total
-        if total_annual > 2000:
-            st.error("😱 **Wow, that's a lot!** You're paying over ₹2,000 in fees annually. Let's see if we can help you reduce this.")
-        elif total_annual > 1000:
-            st.warning("🤔 **That adds up!** Over ₹1,000 per year in fees. Worth reviewing if you can reduce these.")
-        elif total_annual > 500:
-            st.info("💡 **Moderate fees detected.** Not terrible, but there might be room for savings.")
-        else:
-            st.success("🎉 **Good news!** Your fees are relatively low. But every rupee saved is a rupee earned!")
-    
-    st.markdown("---")
-    
-    # Detailed fee breakdown
-    st.markdown("### 📋 Detailed Fee Breakdown")
-    
-    if not df.empty:
-        # Format dataframe for display
-        display_df = df.copy()
-        if 'annual_cost_estimate' in display_df.columns:
-            display_df['Annual Cost'] = display_df['annual_cost_estimate'].apply(
-                lambda x: f"₹{int(x):,}" if pd.notna(x) else "—"
-            )
-        if 'value' in display_df.columns:
-            def fmt_val(r):
-                if r['type'] == 'percent':
-                    return f"{r['value']}%"
-                if r['value'] is None:
-                    return "—"
-                return f"₹{int(r['value']):,}"
-            display_df['Detected Value'] = display_df.apply(fmt_val, axis=1)
-            display_df = display_df.rename(columns={
-                'line': 'Fee Description',
-                'frequency': 'Frequency',
-                'category': 'Category'
-            })
-            # Include category in display
-            cols = ['Category', 'Fee Description', 'Detected Value', 'Frequency', 'Annual Cost']
-            display_df = display_df[[c for c in cols if c in display_df.columns]]
-        
-        # Use dataframe instead of table for better interactivity
-        st.dataframe(display_df, width='stretch', hide_index=True)
-    else:
-        # Celebratory empty state
-        st.markdown("""
-        <div class="info-card" style="text-align: center; padding: 3rem;">
-        <h2>🎉 Fantastic News!</h2>
-        <p style="font-size: 1.2rem; margin-top: 1rem;">We didn't find any obvious fees in this statement.</p>
-        <p style="color: #666; margin-top: 1rem;">This could mean:</p>
-        <ul style="text-align: left; display: inline-block; margin-top: 1rem;">
-        <li>✅ Your bank is being transparent</li>
-        <li>✅ You have a zero-fee account</li>
-        <li>✅ Fees might be on a different statement</li>
-        </ul>
-        <p style="margin-top: 2rem; color: #666;"><em>Try analyzing more statements to get the full picture!</em></p>
-        </div>
-        """, unsafe_allow_html=True)
+# Per-stage tracing for this run only when asked for (see src/tracing.py);
+# the with block closes it even when a widget reruns or stops the script.
+with ExitStack() as trace_run:
+    tracer = None
+    if debug_timings or profile_run:
+        if profile_run and 'profile_path' not in st.session_state:
+            fd, st.session_state.profile_path = tempfile.mkstemp(suffix='.prof', prefix='finfeex_')
+            os.close(fd)
+        tracer = trace_run.enter_context(tracing(st.session_state.profile_path if profile_run else None))
 
-    # Visualization section
-    if not df.empty:
-        st.markdown("---")
-        st.markdown("### 📊 Visual Analysis")
-        
-        viz_col1, viz_col2 = st.columns([2, 1])
-        
-        with viz_col1:
-            if 'annual_cost_estimate' in df.columns:
-                viz = df.dropna(subset=['annual_cost_estimate']).sort_values('annual_cost_estimate', ascending=False).head(5)
-                if not viz.empty:
-                    st.markdown("#### 🔝 Top 5 Annual Fees")
-                    # Create a better formatted chart
-                    chart_data = viz.set_index('line')['annual_cost_estimate']
-                    st.bar_chart(chart_data, width='stretch')
-                    st.caption("💡 These are your biggest fee sources")
-        
-        with viz_col2:
-            st.markdown("#### 📄 Fee Nutrition Label")
-            label = render_fee_nutrition_label(df)
-            st.markdown(label)
-    
-    # Complaint email section
-    st.markdown("---")
-    st.markdown("### 📧 Ready to Fight Back?")
-    st.markdown("<p class='subtitle'>We've drafted a professional email for you. All you need to do is personalize it and hit send!</p>", unsafe_allow_html=True)
+    # Several files: parse them concurrently, listing each as it finishes; the
+    # full results view below is then shown for the one the user picks.
+    uploaded = uploaded_files[0] if len(uploaded_files) == 1 else None
+    if len(uploaded_files) > 1:
+        uploaded = analyze_uploads(uploaded_files, est_txns)
+
+    if uploaded is not None:
+        st.session_state.current_step = 2
     
-    tab1, tab2 = st.tabs(["📝 Email Draft", "💡 Pro Tips"])
+        # Processing section with personality
+        with st.spinner("🔍 Reading your statement... Looking for sneaky fees..."):
+            digest = upload_digest(uploaded)
+            key = upload_key(uploaded, digest)
+            text, fees = parse_stage(key, digest, uploaded)
     
-    with tab1:
-        email = draft_complaint_email(df)
-        st.markdown("**Your personalized complaint email:**")
-        st.text_area(
-            "Click inside to select all (Ctrl+A), then copy (Ctrl+C):",
-            value=email,
-            height=300,
-            help="Feel free to modify this - make it yours!",
-            label_visibility="collapsed"
-        )
-        
-        # Helpful reminder
-        st.info("💡 **Pro tip:** Don't forget to replace [Your name] and add your account details before sending!")
-        
-        # Quick copy button effect
-        col_a, col_b, col_c = st.columns([1, 2, 1])
-        with col_b:
-            if st.button("📋 Select All Text"):
-                st.toast("✅ Text ready! Press Ctrl+A then Ctrl+C to copy", icon="📋")
+        st.session_state.current_step = 3
+        st.markdown('<div class="success-banner">✅ Got it! We found your statement. Now let\'s see what they\'re charging you...</div>', unsafe_allow_html=True)
     
-    with tab2:
-        st.markdown("""
-        <div class="info-card">
-        <h4>📝 Before You Send</h4>
-        <ul>
-        <li>✅ <strong>Personalize it:</strong> Replace [Your name] and contact details</li>
-        <li>✅ <strong>Add specifics:</strong> Include your account number and customer ID</li>
-        <li>✅ <strong>Attach proof:</strong> Download the CSV report below and attach it</li>
-        <li>✅ <strong>Stay professional:</strong> Firm but polite gets better results</li>
-        <li>✅ <strong>Follow through:</strong> Set a reminder to follow up in 14 days</li>
-        </ul>
-        </div>
-        
-        <div class="info-card" style="margin-top: 1rem;">
-        <h4>⚖️ Know Your Rights</h4>
-        <ul>
-        <li>🛡️ Banks <strong>must</strong> disclose all fees clearly (RBI guidelines)</li>
-        <li>💰 You <strong>can</strong> request refunds for unauthorized charges</li>
-        <li>🚪 You <strong>have the right</strong> to close accounts without penalties</li>
-        <li>📞 Contact RBI Banking Ombudsman if bank doesn't respond</li>
-        </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Export and download section
-    st.markdown("---")
-    st.markdown("### 📥 Take This With You")
-    st.markdown("<p class='subtitle'>Save your analysis and use it as evidence when contacting your bank.</p>", unsafe_allow_html=True)
+        # Show extracted text in expander (optional)
+        if show_raw_text:
+            with st.expander("📄 View Extracted Text (First 800 chars)"):
+                st.text_area("Extracted content", value=(text[:800] + "..." if len(text) > 800 else text), height=200, disabled=True)
     
-    col_d1, col_d2, col_d3 = st.columns(3)
+        # Process fees
+        batch = annualize_stage(key, est_txns, fees)
+        report = report_stage(key, est_txns, batch)
     
-    with col_d1:
-        csv_bytes = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label='📊 CSV Report',
-            data=csv_bytes,
-            file_name='finfeex_report.csv',
-            mime='text/csv',
-            help='Download as Excel/Sheets-friendly format',
-            width='stretch'
-        )
-        st.caption("📈 Open in Excel")
+        # Add to history for analytics (same content is only stored once)
+        history.add_statement(uploaded.name, batch, digest=digest)
     
-    with col_d2:
-        json_payload = {
-            'summary': render_fee_nutrition_label(df),
-            'detected_fees': df.to_dict(orient='records')
-        }
-        import json
-        from datetime import datetime
-        json_bytes = json.dumps(json_payload, ensure_ascii=False, indent=2).encode('utf-8')
-        st.download_button(
-            label='📄 JSON Report',
-            data=json_bytes,
-            file_name=f'finfeex_report_{datetime.now().strftime("%Y%m%d")}.json',
-            mime='application/json',
-            help='Download as structured data format',
-            width='stretch'
-        )
-        st.caption("🔧 For developers")
+        # Show analytics link
+        if len(history) > 0:
+            st.info(f"📊 {len(history)} statement(s) tracked. Visit the **Analytics** page to see trends and comparisons!")
     
-    with col_d3:
-        st.download_button(
-            label='📧 Email Draft',
-            data=email.encode('utf-8'),
-            file_name='complaint_email.txt',
-            mime='text/plain',
-            help='Download ready-to-send email template',
-            width='stretch'
-        )
-        st.caption("✍️ Ready to send")
+        render_metrics(report)
+        st.markdown("---")
+        render_breakdown(report.df, key, est_txns)
+        render_visualizations(report)
+        render_email(report, key, est_txns)
+        render_exports(report, key, est_txns)
+        render_ai_insights(report)
     
-    # LLM Summary section (optional advanced feature)
-    st.markdown("---")
-    with st.expander("🤖 Want Even Deeper Insights? (AI-Powered)"):
+        # Footer with helpful next steps
+        st.markdown("---")
         st.markdown("""
         <div class="info-card">
-        <p>Use OpenAI's AI to get personalized recommendations and strategies to reduce your fees.</p>
-        <p><strong>Note:</strong> Requires your own OpenAI API key (not stored, used only for this session).</p>
+        <h4>🎉 What's Next?</h4>
+        <ol>
+        <li><strong>Send the email</strong> to your bank (don't forget to personalize it!)</li>
+        <li><strong>Track your statements</strong> over time using our Analytics page</li>
+        <li><strong>Compare with other banks</strong> using our Comparison tool</li>
+        <li><strong>Share FinFeeX</strong> with friends who might be overpaying too!</li>
+        </ol>
+        <p style="margin-top: 1rem; color: #666;"><em>Remember: Every fee you question is a step towards financial transparency. You've got this! 💪</em></p>
         </div>
         """, unsafe_allow_html=True)
-        
-        api_key = st.text_input(
-            '🔑 OpenAI API Key',
-            type='password',
-            help="Get your API key from platform.openai.com. It's not stored anywhere.",
-            placeholder="sk-..."
-        )
-        
-        if api_key:
-            if st.button('✨ Generate Personalized AI Insights', type='primary'):
-                with st.spinner('🧠 AI is analyzing your fees and finding savings opportunities...'):
-                    try:
-                        llm_out = llm_summary(text, openai_api_key=api_key)
-                        st.markdown("#### 🎯 Your Personalized Insights")
-                        st.success(llm_out)
-                    except Exception as e:
-                        st.error(f"❌ Oops! Something went wrong: {str(e)}")
-                        st.info("💡 Make sure your API key is valid and has credits available.")
-    
-    # Footer with helpful next steps
-    st.markdown("---")
-    st.markdown("""
-    <div class="info-card">
-    <h4>🎉 What's Next?</h4>
-    <ol>
-    <li><strong>Send the email</strong> to your bank (don't forget to personalize it!)</li>
-    <li><strong>Track your statements</strong> over time using our Analytics page</li>
-    <li><strong>Compare with other banks</strong> using our Comparison tool</li>
-    <li><strong>Share FinFeeX</strong> with friends who might be overpaying too!</li>
-    </ol>
-    <p style="margin-top: 1rem; color: #666;"><em>Remember: Every fee you question is a step towards financial transparency. You've got this! 💪</em></p>
-    </div>
-    """, unsafe_allow_html=True)
 
-else:
-    # Welcome screen when no file is uploaded
-    st.markdown("---")
+    else:
+        # Welcome screen when no file is uploaded
+        st.markdown("---")
     
-    col_w1, col_w2, col_w3 = st.columns(3)
+        col_w1, col_w2, col_w3 = st.columns(3)
+    
+        with col_w1:
+            st.markdown("""
+            ### 🔍 How It Works
+            1. Upload your statement
+            2. AI detects hidden fees
+            3. Get annual cost estimate
+            4. Download complaint email
+            """)
+    
+        with col_w2:
+            st.markdown("""
+            ### 🔒 Privacy First
+            - No data stored
+            - Local processing
+            - No tracking
+            - Open source
+            """)
+    
+        with col_w3:
+            st.markdown("""
+            ### 💪 Take Action
+            - Know your fees
+            - Save money
+            - Hold banks accountable
+            - Share with friends
+            """)
     
-    with col_w1:
-        st.markdown("""
-        ### 🔍 How It Works
-        1. Upload your statement
-        2. AI detects hidden fees
-        3. Get annual cost estimate
-        4. Download complaint email
-        """)
-    
-    with col_w2:
-        st.markdown("""
-        ### 🔒 Privacy First
-        - No data stored
-        - Local processing
-        - No tracking
-        - Open source
-        """)
+        st.markdown("---")
+        st.markdown("### 📸 Example Output Preview")
     
-    with col_w3:
+        # Create example output visualization
         st.markdown("""
-        ### 💪 Take Action
-        - Know your fees
-        - Save money
-        - Hold banks accountable
-        - Share with friends
-        """)
-    
-    st.markdown("---")
-    st.markdown("### 📸 Example Output Preview")
-    
-    # Create example output visualization
-    st.markdown("""
-    <div class="example-card">
-        <h3 style="color: #667eea; margin-bottom: 1rem;">💰 Sample Analysis Results</h3>
-        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 1rem; margin-top: 1.5rem;">
-            <div class="example-metric">
-                <div style="font-size: 0.9rem; color: #666;">💰 Total Annual Cost</div>
-                <div style="font-size: 1.8rem; font-weight: bold; color: #667eea; margin-top: 0.5rem;">₹1,088</div>
+        <div class="example-card">
+            <h3 style="color: #667eea; margin-bottom: 1rem;">💰 Sample Analysis Results</h3>
+            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 1rem; margin-top: 1.5rem;">
+                <div class="example-metric">
+                    <div style="font-size: 0.9rem; color: #666;">💰 Total Annual Cost</div>
+                    <div style="font-size: 1.8rem; font-weight: bold; color: #667eea; margin-top: 0.5rem;">₹1,088</div>
+                </div>
+                <div class="example-metric">
+                    <div style="font-size: 0.9rem; color: #666;">📊 Transparency Score</div>
+                    <div style="font-size: 1.8rem; font-weight: bold; color: #11998e; margin-top: 0.5rem;">68%</div>
+                </div>
+                <div class="example-metric">
+                    <div style="font-size: 0.9rem; color: #666;">🔍 Fees Detected</div>
+                    <div style="font-size: 1.8rem; font-weight: bold; color: #764ba2; margin-top: 0.5rem;">5</div>
+                </div>
             </div>
-            <div class="example-metric">
-                <div style="font-size: 0.9rem; color: #666;">📊 Transparency Score</div>
-                <div style="font-size: 1.8rem; font-weight: bold; color: #11998e; margin-top: 0.5rem;">68%</div>
+            <div style="margin-top: 2rem; text-align: left; background: white; padding: 1.5rem; border-radius: 10px;">
+                <div style="font-weight: bold; margin-bottom: 1rem; color: #667eea;">📋 Sample Detected Fees:</div>
+                <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">• <span class="highlight">Convenience Fee</span> (Monthly): ₹49/month → <strong>₹588/year</strong></div>
+                <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">• <span class="highlight">FX Markup</span>: 3.5% → <strong>₹300/year</strong></div>
+                <div style="padding: 0.5rem 0;">• <span class="highlight">Annual Fee</span>: <strong>₹200</strong></div>
             </div>
-            <div class="example-metric">
-                <div style="font-size: 0.9rem; color: #666;">🔍 Fees Detected</div>
-                <div style="font-size: 1.8rem; font-weight: bold; color: #764ba2; margin-top: 0.5rem;">5</div>
+            <div style="margin-top: 1.5rem; padding: 1rem; background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); color: white; border-radius: 8px; font-weight: 600;">
+                ✨ Upload your statement to see your actual fees!
             </div>
         </div>
-        <div style="margin-top: 2rem; text-align: left; background: white; padding: 1.5rem; border-radius: 10px;">
-            <div style="font-weight: bold; margin-bottom: 1rem; color: #667eea;">📋 Sample Detected Fees:</div>
-            <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">• <span class="highlight">Convenience Fee</span> (Monthly): ₹49/month → <strong>₹588/year</strong></div>
-            <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">• <span class="highlight">FX Markup</span>: 3.5% → <strong>₹300/year</strong></div>
-            <div style="padding: 0.5rem 0;">• <span class="highlight">Annual Fee</span>: <strong>₹200</strong></div>
-        </div>
-        <div style="margin-top: 1.5rem; padding: 1rem; background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); color: white; border-radius: 8px; font-weight: 600;">
-            ✨ Upload your statement to see your actual fees!
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+
+if tracer is not None:
+    with debug_panel:
+        st.markdown("#### ⏱️ Pipeline Timings")
+        if tracer.records:
+            st.dataframe(pd.DataFrame(tracer.totals()), hide_index=True)
+        else:
+            st.caption("Nothing ran this time (results came from the cache).")
+        if profile_run:
+            with open(st.session_state.profile_path, 'rb') as fh:
+                st.download_button('📥 Download profile (.prof)', data=fh.read(), file_name='finfeex.prof')
@@ -0,0 +1 @@
+"""FinFeeX performance benchmarks."""
@@ -0,0 +1,39 @@
+"""Compare pdfplumber-only and tiered (PyPDF2 first) extraction on a text-native PDF.
+
+Run from the project root:
+
+    python -m benchmarks.bench_extraction --pages 100
+"""
+import argparse
+import io
+import time
+from collections import Counter
+
+from benchmarks.synthetic import LINES_PER_PAGE, statement_pdf
+from src.pdf_parser import iter_pages, iter_pages_tiered
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    data = statement_pdf(args.pages * LINES_PER_PAGE)
+    slow, _ = _time(lambda: list(iter_pages(io.BytesIO(data))))
+    fast, pages = _time(lambda: list(iter_pages_tiered(io.BytesIO(data))))
+    backends = Counter(backend for _, _, backend in pages)
+
+    print(f"pages:        {args.pages}")
+    print(f"pdfplumber:   {slow:.3f}s")
+    print(f"tiered:       {fast:.3f}s  {dict(backends)}")
+    print(f"speedup:      {slow / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Time every pipeline stage on synthetic statements and compare against a baseline.
+
+Run from the project root:
+
+    python -m benchmarks.run --lines 20000 --pdf-lines 2000
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional
+
+from benchmarks.synthetic import statement_pdf, statement_text
+from src.costs import annualize_fees
+from src.fee_detector import detect_fees_in_text
+from src.pdf_parser import extract_text_from_pdf_or_text
+from src.summarizer import render_fee_nutrition_label
+
+
+def measure(fn: Callable[[], object], lines: int, repeat: int = 3) -> Dict[str, float]:
+    """Best-of-``repeat`` wall time, plus peak traced memory from one extra run."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': best,
+        'lines_per_sec': lines / best if best else float('inf'),
+        'peak_mb': peak / (1024 * 1024),
+    }
+
+
+def run_suite(lines: int = 20000, pdf_lines: int = 2000, seed: int = 0, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    text_bytes = statement_text(lines, seed).encode('utf-8')
+    pdf_bytes = statement_pdf(pdf_lines, seed)
+    text = extract_text_from_pdf_or_text(io.BytesIO(text_bytes))
+    fees = detect_fees_in_text(text)
+    df = annualize_fees(fees, estimated_annual_txns=12)
+
+    def end_to_end(data):
+        fees = detect_fees_in_text(extract_text_from_pdf_or_text(io.BytesIO(data)))
+        return render_fee_nutrition_label(annualize_fees(fees, estimated_annual_txns=12))
+
+    stages = {
+        'extract_text': (lambda: extract_text_from_pdf_or_text(io.BytesIO(text_bytes)), lines),
+        'extract_pdf': (lambda: extract_text_from_pdf_or_text(io.BytesIO(pdf_bytes)), pdf_lines),
+        'detect': (lambda: detect_fees_in_text(text), lines),
+        'annualize': (lambda: annualize_fees(fees, estimated_annual_txns=12), lines),
+        'render_label': (lambda: render_fee_nutrition_label(df), lines),
+        'end_to_end_text': (lambda: end_to_end(text_bytes), lines),
+        'end_to_end_pdf': (lambda: end_to_end(pdf_bytes), pdf_lines),
+    }
+    return {name: measure(fn, n, repeat) for name, (fn, n) in stages.items()}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> list:
+    """Return ``(stage, ratio)`` for stages slower than baseline by more than ``tolerance``."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def print_table(results, baseline: Optional[dict] = None, out=sys.stdout) -> None:
+    header = f"{'stage':<18}{'seconds':>10}{'lines/s':>14}{'peak MB':>10}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header, file=out)
+    for name, r in results.items():
+        row = f"{name:<18}{r['seconds']:>10.4f}{r['lines_per_sec']:>14,.0f}{r['peak_mb']:>10.1f}"
+        if baseline and name in baseline:
+            row += f"{r['seconds'] / baseline[name]['seconds']:>9.2f}x"
+        print(row, file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20000, help='lines in the text statement')
+    parser.add_argument('--pdf-lines', type=int, default=2000, help='lines in the PDF statement')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before failing (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.lines, args.pdf_lines, args.seed, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            baseline = json.load(fh)['results']
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as fh:
+            json.dump({
+                'params': {'lines': args.lines, 'pdf_lines': args.pdf_lines, 'seed': args.seed},
+                'python': platform.python_version(),
+                'results': results,
+            }, fh, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:.2f}x baseline", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
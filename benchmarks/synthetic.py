@@ -0,0 +1,68 @@
+"""Seeded synthetic statements for benchmarks, in plain text and PDF."""
+import io
+import random
+from typing import List
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+MERCHANTS = [
+    "POS purchase Grocery Mart", "UPI transfer to R Sharma", "Amazon marketplace order",
+    "Swiggy food order", "Uber ride", "NEFT salary credit", "Electricity bill payment",
+    "Fuel station purchase", "Pharmacy purchase", "Movie tickets", "Rent payment",
+]
+FEES = [
+    "Online payment convenience fee {cur}{amt}",
+    "Foreign transaction markup {pct}%",
+    "Monthly account maintenance {cur}{amt} monthly",
+    "Annual credit card fee {cur}{amt}",
+    "ATM cash withdrawal charge {cur}{amt} per txn",
+    "SMS alert service {cur}{amt} monthly",
+    "Late payment penalty {cur}{amt}",
+    "Processing Fee {cur}{amt}",
+    "Fuel surcharge {pct}%",
+]
+LINES_PER_PAGE = 45
+STATEMENT_HEADER = "Account Statement - Synthetic Bank"
+
+
+def generate_lines(n_lines: int, seed: int = 0, fee_ratio: float = 0.05, currency: str = "₹") -> List[str]:
+    """Return ``n_lines`` statement lines, about ``fee_ratio`` of them fees."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        day = f"{1 + i % 28:02d}-Sep-2025"
+        if rng.random() < fee_ratio:
+            desc = rng.choice(FEES).format(cur=currency, amt=rng.randint(10, 999), pct=rng.choice([1.0, 2.5, 3.5]))
+            lines.append(f"{desc:<60}{day}")
+        else:
+            amount = f"{currency}{rng.randint(20, 20000):,}.{rng.randint(0, 99):02d}"
+            lines.append(f"{rng.choice(MERCHANTS):<45}{amount:>15}{day:>15}")
+    return lines
+
+
+def statement_text(n_lines: int, seed: int = 0, fee_ratio: float = 0.05) -> str:
+    header = [STATEMENT_HEADER, "Description                                      Amount        Date"]
+    return "\n".join(header + generate_lines(n_lines, seed, fee_ratio)) + "\n"
+
+
+def statement_pdf(n_lines: int, seed: int = 0, fee_ratio: float = 0.05,
+                  lines_per_page: int = LINES_PER_PAGE) -> bytes:
+    """Render the same kind of statement as a text-native PDF.
+
+    Each page starts with the bank's header line, like a real statement.
+    Uses ``Rs`` instead of ``₹`` because reportlab's built-in fonts lack the glyph.
+    """
+    lines = generate_lines(n_lines, seed, fee_ratio, currency="Rs ")
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    c.setFont("Courier", 8)
+    for start in range(0, len(lines), lines_per_page):
+        c.drawString(30, 816, STATEMENT_HEADER)
+        y = 800
+        for line in lines[start:start + lines_per_page]:
+            c.drawString(30, y, line)
+            y -= 16
+        c.showPage()
+    c.save()
+    return buf.getvalue()
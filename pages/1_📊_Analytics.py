@@ -3,17 +3,18 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from src.history import session_history
 
 st.set_page_config(page_title="Fee Analytics", page_icon="📊", layout="wide")
 
 st.title("📊 Fee Analytics Dashboard")
 
-# Initialize session state for historical tracking
-if 'fee_history' not in st.session_state:
-    st.session_state.fee_history = []
+# Statement history with per-statement totals computed at upload time
+history = session_history(st.session_state)
+overall = history.overall()
 
 # Check if we have any data
-if not st.session_state.fee_history:
+if overall['statements'] == 0:
     st.info("💡 **Tip**: Analyze statements on the main page first. Your fee history will appear here for comparison and trend analysis.")
     
     # Show sample analytics preview
@@ -69,37 +70,23 @@ if not st.session_state.fee_history:
     st.plotly_chart(fig, use_container_width=True)
     
 else:
-    # Show actual analytics from session state
-    st.success(f"✅ Tracking {len(st.session_state.fee_history)} statement(s)")
-    
-    # Aggregate all fees
-    all_fees = []
-    for entry in st.session_state.fee_history:
-        for fee in entry['fees']:
-            fee_copy = fee.copy()
-            fee_copy['date'] = entry['date']
-            fee_copy['statement'] = entry['name']
-            all_fees.append(fee_copy)
-    
-    df = pd.DataFrame(all_fees)
+    # Show actual analytics from the stored aggregates
+    st.success(f"✅ Tracking {overall['statements']} statement(s)")
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total = df['annual_cost_estimate'].sum() if 'annual_cost_estimate' in df.columns else 0
-        st.metric("Total Annual Fees", f"₹{int(total):,}")
+        st.metric("Total Annual Fees", f"₹{int(overall['total']):,}")
     
     with col2:
-        avg = df['annual_cost_estimate'].mean() if 'annual_cost_estimate' in df.columns else 0
-        st.metric("Average Fee", f"₹{int(avg):,}")
+        st.metric("Average Fee", f"₹{int(overall['mean']):,}")
     
     with col3:
-        st.metric("Unique Fees", len(df))
+        st.metric("Unique Fees", overall['count'])
     
     with col4:
-        categories = df['category'].nunique() if 'category' in df.columns else 0
-        st.metric("Categories", categories)
+        st.metric("Categories", overall['categories'])
     
     st.markdown("---")
     
@@ -108,19 +95,16 @@ else:
     
     with col_a:
         st.markdown("#### 📊 Fees by Category")
-        if 'category' in df.columns and 'annual_cost_estimate' in df.columns:
-            cat_data = df.groupby('category')['annual_cost_estimate'].sum().sort_values(ascending=False)
-            fig = px.pie(values=cat_data.values, names=cat_data.index, 
+        cat_data = history.category_totals()
+        if not cat_data.empty:
+            fig = px.pie(values=cat_data['total'], names=cat_data['category'], 
                         color_discrete_sequence=px.colors.sequential.Purples_r)
             st.plotly_chart(fig, use_container_width=True)
     
     with col_b:
         st.markdown("#### 📈 Trend Analysis")
-        if len(st.session_state.fee_history) > 1:
-            trend_data = pd.DataFrame([
-                {'Date': entry['date'], 'Total': sum(f.get('annual_cost_estimate', 0) for f in entry['fees'])}
-                for entry in st.session_state.fee_history
-            ])
+        if overall['statements'] > 1:
+            trend_data = history.summaries().rename(columns={'date': 'Date', 'total': 'Total'})
             fig = px.line(trend_data, x='Date', y='Total', markers=True,
                          line_shape='spline', color_discrete_sequence=['#667eea'])
             fig.update_layout(yaxis_title='Annual Cost (₹)')
@@ -128,15 +112,17 @@ else:
         else:
             st.info("Upload more statements to see trends")
     
-    # Detailed table
+    # Detailed table (raw rows are only read here, a page at a time)
     st.markdown("---")
     st.markdown("#### 📋 All Detected Fees")
-    if 'category' in df.columns:
-        display_cols = ['statement', 'category', 'line', 'type', 'value', 'annual_cost_estimate']
-        display_df = df[[c for c in display_cols if c in df.columns]]
-        st.dataframe(display_df, width='stretch', hide_index=True)
+    rows_per_page = 500
+    pages = max(1, -(-overall['count'] // rows_per_page))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    display_cols = ['statement', 'category', 'line', 'type', 'value', 'annual_cost_estimate']
+    display_df = history.fees(limit=rows_per_page, offset=(page - 1) * rows_per_page)[display_cols]
+    st.dataframe(display_df, width='stretch', hide_index=True)
     
     # Clear history button
     if st.button("🗑️ Clear History"):
-        st.session_state.fee_history = []
+        history.clear()
         st.rerun()
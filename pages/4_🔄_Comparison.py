@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from src.comparison import StatementComparison
+from src.history import session_history
 
 st.set_page_config(page_title="Bank Comparison", page_icon="🔄", layout="wide")
 
@@ -12,7 +13,8 @@ Upload statements from different banks and see side-by-side comparisons.
 """)
 
 # Check if we have history to compare
-if 'fee_history' not in st.session_state or len(st.session_state.fee_history) < 2:
+history = session_history(st.session_state)
+if len(history) < 2:
     st.warning("📊 You need at least 2 statements analyzed to compare. Upload statements on the main page first!")
     
     st.markdown("---")
@@ -45,68 +47,57 @@ if 'fee_history' not in st.session_state or len(st.session_state.fee_history) <
         """)
 
 else:
-    # Show comparison
-    statements = st.session_state.fee_history
-    
-    st.success(f"✅ Comparing {len(statements)} statement(s)")
-    
-    # Create comparison dataframe
-    comparison_data = []
-    for stmt in statements:
-        fees_df = pd.DataFrame(stmt['fees'])
-        total = fees_df['annual_cost_estimate'].sum() if 'annual_cost_estimate' in fees_df.columns else 0
-        avg = fees_df['annual_cost_estimate'].mean() if 'annual_cost_estimate' in fees_df.columns else 0
-        count = len(fees_df)
-        
-        # Category breakdown
-        if 'category' in fees_df.columns:
-            cat_totals = fees_df.groupby('category')['annual_cost_estimate'].sum().to_dict()
-        else:
-            cat_totals = {}
-        
-        comparison_data.append({
-            'Statement': stmt['name'],
-            'Date': stmt['date'],
-            'Total Annual Cost': total,
-            'Average Fee': avg,
-            'Fee Count': count,
-            'Categories': cat_totals
-        })
-    
-    comp_df = pd.DataFrame(comparison_data)
-    
-    # Overall comparison metrics
-    st.markdown("### 📊 Overall Comparison")
+    # Show comparison, built once per change to the history
+    memo = st.session_state.get('comparison_memo')
+    if memo is None or memo[0] != history.version():
+        memo = (history.version(), StatementComparison.from_store(history))
+        st.session_state.comparison_memo = memo
+    comparison = memo[1]
+    comp_df = comparison.table
     
-    cols = st.columns(len(statements))
-    for idx, (col, row) in enumerate(zip(cols, comparison_data)):
-        with col:
-            is_best = row['Total Annual Cost'] == comp_df['Total Annual Cost'].min()
-            color = "green" if is_best else "blue"
-            st.markdown(f"**{row['Statement']}**")
-            st.metric("Total Annual", f"₹{int(row['Total Annual Cost']):,}", 
-                     delta="Best Deal!" if is_best else None,
-                     delta_color="normal" if is_best else "off")
-            st.metric("Avg Fee", f"₹{int(row['Average Fee']):,}")
-            st.metric("Fee Count", row['Fee Count'])
+    st.success(f"✅ Comparing {len(comparison)} statement(s)")
     
     # Savings calculation
-    st.markdown("---")
     st.markdown("### 💰 Potential Savings")
     
-    min_cost = comp_df['Total Annual Cost'].min()
-    max_cost = comp_df['Total Annual Cost'].max()
-    savings = max_cost - min_cost
-    
-    if savings > 0:
-        best_bank = comp_df.loc[comp_df['Total Annual Cost'].idxmin(), 'Statement']
-        worst_bank = comp_df.loc[comp_df['Total Annual Cost'].idxmax(), 'Statement']
-        
+    savings = comparison.savings()
+    if savings:
         st.success(f"""
-        💡 **Insight**: Switching from **{worst_bank}** to **{best_bank}** could save you 
-        **₹{int(savings):,}** per year!
+        💡 **Insight**: Switching from **{savings['worst']}** to **{savings['best']}** could save you 
+        **₹{int(savings['amount']):,}** per year!
         """)
     
+    # Best and worst statements
+    top_n = min(5, len(comparison))
+    col_best, col_worst = st.columns(2)
+    summary_cols = ['Statement', 'Total Annual Cost', 'Average Fee', 'Fee Count']
+    with col_best:
+        st.markdown(f"#### 🏆 Cheapest {top_n}")
+        st.dataframe(comparison.best(top_n)[summary_cols], width='stretch', hide_index=True)
+    with col_worst:
+        st.markdown(f"#### 💸 Most Expensive {top_n}")
+        st.dataframe(comparison.worst(top_n)[summary_cols], width='stretch', hide_index=True)
+    
+    # Overall comparison metrics, a page of cards at a time
+    st.markdown("---")
+    st.markdown("### 📊 Overall Comparison")
+    
+    cards_per_row, per_page = 4, 8
+    pages = comparison.pages(per_page)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    page_df = comparison.page(page, per_page)
+    for start in range(0, len(page_df), cards_per_row):
+        cols = st.columns(cards_per_row)
+        for col, row in zip(cols, page_df.iloc[start:start + cards_per_row].to_dict('records')):
+            with col:
+                is_best = row['Rank'] == 1
+                st.markdown(f"**{row['Statement']}**")
+                st.metric("Total Annual", f"₹{int(row['Total Annual Cost']):,}", 
+                         delta="Best Deal!" if is_best else None,
+                         delta_color="normal" if is_best else "off")
+                st.metric("Avg Fee", f"₹{int(row['Average Fee']):,}")
+                st.metric("Fee Count", row['Fee Count'])
+    
     # Visual comparison
     st.markdown("---")
     st.markdown("### 📊 Visual Comparison")
@@ -129,32 +120,21 @@ else:
         fig.update_layout(showlegend=False)
         st.plotly_chart(fig, use_container_width=True)
     
-    # Category breakdown
+    # Category breakdown: statements on this page x the costliest categories
     st.markdown("---")
     st.markdown("### 📋 Category Breakdown")
     
-    # Prepare category comparison data
-    all_categories = set()
-    for row in comparison_data:
-        all_categories.update(row['Categories'].keys())
-    
-    cat_comparison = []
-    for cat in all_categories:
-        row_data = {'Category': cat}
-        for stmt in comparison_data:
-            row_data[stmt['Statement']] = stmt['Categories'].get(cat, 0)
-        cat_comparison.append(row_data)
-    
-    cat_df = pd.DataFrame(cat_comparison)
-    
-    if not cat_df.empty:
-        fig = px.bar(cat_df, x='Category', y=[col for col in cat_df.columns if col != 'Category'],
-                    barmode='group', color_discrete_sequence=px.colors.sequential.Purples)
-        fig.update_layout(yaxis_title="Annual Cost (₹)", xaxis_title="Fee Category")
+    cat_df = comparison.top_categories(10).loc[page_df.index]
+    if not cat_df.empty and len(cat_df.columns):
+        if len(cat_df) <= 4:
+            fig = px.bar(cat_df.T, barmode='group', color_discrete_sequence=px.colors.sequential.Purples)
+        else:
+            fig = px.imshow(cat_df, aspect='auto', color_continuous_scale='Purples', text_auto='.0f')
+        fig.update_layout(yaxis_title="Annual Cost (₹)" if len(cat_df) <= 4 else "Statement", xaxis_title="Fee Category")
         st.plotly_chart(fig, use_container_width=True)
     
     # Detailed table
     st.markdown("---")
     st.markdown("### 📄 Detailed Comparison Table")
-    st.dataframe(comp_df[['Statement', 'Date', 'Total Annual Cost', 'Average Fee', 'Fee Count']], 
+    st.dataframe(comp_df[['Statement', 'Date', 'Total Annual Cost', 'Average Fee', 'Fee Count', 'Rank']], 
                 width='stretch', hide_index=True)
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.fee_detector import detect_fees_in_lines, detect_fees_in_text
+from src.layouts import LayoutStore
+from src.pdf_parser import detect_format, extract_text_from_pdf_or_text, iter_statement_lines
+
+
+def content_digest(data: bytes) -> str:
+    """Return the hex SHA-256 of an uploaded file's bytes (the cache key)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(fh, chunk_size: int = 1 << 20) -> str:
+    """:func:`content_digest` of a binary file object, read ``chunk_size`` bytes at a time."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Version of the cached ``{'text', 'fees'}`` entries. Bump it whenever the
+# extracted text or the fee fields change (e.g. when ``line_no`` was added),
+# so disk entries written by older code are parsed again, not served.
+CACHE_SCHEMA = 3
+
+
+def result_key(digest: str, layouts: Optional[LayoutStore] = None, tiered: bool = False,
+               filename: str = '') -> str:
+    """Cache key of an upload's result: its digest, :data:`CACHE_SCHEMA` and the extraction options.
+
+    Only the extension of ``filename`` is part of the key, as it can decide the format.
+    """
+    options = [CACHE_SCHEMA, tiered, None if layouts is None else layouts.path or '',
+               os.path.splitext(filename)[1].lower()]
+    return f"{digest}-{hashlib.sha256(json.dumps(options).encode('utf-8')).hexdigest()[:12]}"
+
+
+class ResultCache:
+    """Two-tier cache of extraction/detection results keyed by :func:`result_key`.
+
+    The in-memory tier is an LRU of at most ``max_entries`` results. When
+    ``cache_dir`` is given, results are also written there as JSON files and
+    the least recently used files are evicted once the directory holds more
+    than ``max_bytes``. Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: Optional[str] = None,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.json"
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return self._memory[digest]
+
+        if self.cache_dir is None:
+            return None
+        path = self._path(digest)
+        try:
+            with open(path, encoding='utf-8') as fh:
+                value = json.load(fh)
+            os.utime(path)  # mark as recently used for disk eviction
+        except (OSError, ValueError):
+            return None
+        self._remember(digest, value)
+        return value
+
+    def put(self, digest: str, value: Dict[str, Any]) -> None:
+        """Remember ``value`` and, with a ``cache_dir``, write it to disk.
+
+        The disk tier is best-effort: a failed write (full disk, read-only
+        directory) leaves no temp file behind and keeps the memory entry.
+        """
+        self._remember(digest, value)
+        if self.cache_dir is None:
+            return
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, suffix='.tmp',
+                                             delete=False) as fh:
+                tmp = fh.name
+                json.dump(value, fh, ensure_ascii=False)
+            os.replace(tmp, self._path(digest))
+            tmp = None
+            self._evict_disk()
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _remember(self, digest: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[digest] = value
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+
+def parse_statement(data: bytes, layouts: Optional[LayoutStore] = None, tiered: bool = False,
+                    filename: str = '') -> Tuple[str, List[Dict[str, Any]]]:
+    """Extracted text and fee candidates for one file's bytes (no caching).
+
+    ``filename``'s extension is checked before the content is sniffed for
+    a format (see :func:`src.formats.sniff_format`). ``layouts`` reads PDFs from known bank layouts by column (see :mod:`src.layouts`)
+    and ``tiered`` extracts them page by page with :func:`iter_pages_tiered`.
+    Other formats go to the detector one parsed row per line.
+    """
+    upload = io.BytesIO(data)
+    upload.name = filename
+    if detect_format(upload) != 'pdf':
+        lines = list(iter_statement_lines(upload))
+        return "\n".join(lines), detect_fees_in_lines(lines)
+    text = extract_text_from_pdf_or_text(upload, tiered=tiered, layouts=layouts)
+    return text, detect_fees_in_text(text)
+
+
+def extract_and_detect(data: bytes, cache: Optional[ResultCache] = None, digest: Optional[str] = None,
+                       layouts: Optional[LayoutStore] = None,
+                       tiered: bool = False, filename: str = '') -> Tuple[str, str, List[Dict[str, Any]]]:
+    """Return ``(digest, text, fees)`` for an upload, parsing it at most once.
+
+    Identical bytes parsed with the same options share one cache entry
+    whatever the file is called, as long as its extension is the same. Pass ``digest`` when it is already known to
+    skip re-hashing ``data``.
+    """
+    digest = digest or content_digest(data)
+    key = result_key(digest, layouts, tiered, filename)
+    hit = cache.get(key) if cache is not None else None
+    if hit is not None:
+        return digest, hit['text'], hit['fees']
+
+    text, fees = parse_statement(data, layouts, tiered, filename)
+    if cache is not None:
+        cache.put(key, {'text': text, 'fees': fees})
+    return digest, text, fees
+
+
+def extract_and_detect_many(items: Iterable[Tuple[str, bytes, str]], cache: Optional[ResultCache] = None,
+                            workers: int = 1, layouts: Optional[LayoutStore] = None,
+                            tiered: bool = False) -> Iterator[Tuple[str, Optional[str], Optional[List[Dict[str, Any]]], Optional[Exception]]]:
+    """Parse several ``(digest, data, filename)`` uploads, yielding each as soon as it is done.
+
+    Yields ``(digest, text, fees, error)`` in completion order: cached files
+    first, then the rest as they finish on a pool of ``workers`` processes.
+    A file that fails yields its exception as ``error`` instead of stopping
+    the others. Each digest is parsed and yielded once, under the first
+    file name it came with.
+    """
+    seen, todo = set(), {}
+    for digest, data, filename in items:
+        if digest in seen:
+            continue
+        seen.add(digest)
+        hit = cache.get(result_key(digest, layouts, tiered, filename)) if cache is not None else None
+        if hit is not None:
+            yield digest, hit['text'], hit['fees'], None
+        else:
+            todo[digest] = data, filename
+
+    def finished(digest, result, error):
+        if error is not None:
+            return digest, None, None, error
+        text, fees = result
+        if cache is not None:
+            cache.put(result_key(digest, layouts, tiered, todo[digest][1]), {'text': text, 'fees': fees})
+        return digest, text, fees, None
+
+    if workers <= 1 or len(todo) <= 1:
+        for digest, (data, filename) in todo.items():
+            try:
+                result = parse_statement(data, layouts, tiered, filename)
+            except Exception as exc:
+                yield finished(digest, None, exc)
+                continue
+            yield finished(digest, result, None)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+        futures = {pool.submit(parse_statement, data, layouts, tiered, filename): digest
+                   for digest, (data, filename) in todo.items()}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield finished(futures[future], None if error else future.result(), error)
@@ -0,0 +1,232 @@
+"""Headless batch runner: ``python -m src <dirs|globs|files> [options]``.
+
+Runs extract -> detect -> annualize for every statement on a process pool
+and streams one JSONL/CSV record per detected fee, tagged with its source file.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.cache import file_digest
+from src.costs import annualize_fees
+from src.fee_batch import FeeBatch
+from src.fee_detector import detect_fees_in_lines
+from src.history import HistoryStore
+from src.layouts import LayoutStore
+from src.pdf_parser import detect_fees_in_pdf, detect_fees_in_text_file, detect_format, iter_statement_lines
+from src.tracing import current_tracer, format_totals, tracing
+
+STATEMENT_EXTENSIONS = ('.pdf', '.txt', '.csv', '.ofx', '.qfx')
+FIELDS = ['source', 'page', 'line_no', 'category', 'line', 'type', 'value', 'frequency', 'annual_cost_estimate']
+
+
+def iter_statement_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """Expand directories (recursively), glob patterns and plain file paths."""
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = (os.path.join(root, name)
+                     for root, _, names in os.walk(item) for name in sorted(names)
+                     if name.lower().endswith(STATEMENT_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths = sorted(glob.glob(item, recursive=True))
+        else:
+            paths = [item]  # passed through even if missing so the failure is reported
+        for path in paths:
+            if path in seen or os.path.isdir(path):
+                continue
+            seen.add(path)
+            yield path
+
+
+def skip_known(paths: Iterable[str], history: HistoryStore, digests: Dict[str, str]) -> Iterator[str]:
+    """Drop files whose content is already in ``history`` or earlier in ``paths``.
+
+    The digest of each file passed on is left in ``digests`` under its path.
+    Unreadable files are passed on so the failure is reported.
+    """
+    seen = set()
+    for path in paths:
+        try:
+            with open(path, 'rb') as fh:
+                digest = file_digest(fh)
+        except OSError:
+            yield path
+            continue
+        if digest in seen or digest in history:
+            continue
+        seen.add(digest)
+        digests[path] = digest
+        yield path
+
+
+def process_statement(path: str, estimated_annual_txns: int = 12, assumed_txn_value: float = 100.0,
+                      tiered: bool = False, prefilter: bool = False,
+                      layouts: Optional[LayoutStore] = None) -> List[Dict[str, Any]]:
+    """Run the whole pipeline on one file and return its fee records.
+
+    Plain-text statements are streamed through the detector instead of
+    being read whole, so their size is not limited by memory; PDFs are
+    scanned page by page so each fee carries its page number. ``prefilter``
+    skips layout extraction on PDF pages without fee keywords and
+    ``layouts`` reads PDFs from known bank layouts by column.
+    """
+    with open(path, 'rb') as fh:
+        kind = detect_format(fh)
+        if kind == 'txt':
+            fees = detect_fees_in_text_file(fh)
+        elif kind == 'pdf':
+            fees = detect_fees_in_pdf(fh, tiered=tiered, prefilter=prefilter, layouts=layouts)
+        else:
+            fees = detect_fees_in_lines(iter_statement_lines(fh))
+    df = annualize_fees(fees, estimated_annual_txns=estimated_annual_txns, assumed_txn_value=assumed_txn_value)
+    if df.empty:
+        return []
+    for key in ('category', 'page', 'line_no'):
+        df[key] = [f.get(key) for f in fees]
+    df.insert(0, 'source', path)
+    df = df.astype(object).where(df.notna(), None)
+    return df[FIELDS].to_dict('records')
+
+
+def _process_traced(path: str, **options):
+    """Worker-side :func:`process_statement` that also returns its stage timings."""
+    with tracing() as tracer:
+        records = process_statement(path, **options)
+    return records, tracer.records
+
+
+class _Writer:
+    def __init__(self, out, fmt: str):
+        self.out = out
+        self.csv = csv.DictWriter(out, fieldnames=FIELDS) if fmt == 'csv' else None
+        if self.csv is not None:
+            self.csv.writeheader()
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            if self.csv is not None:
+                self.csv.writerow(record)
+            else:
+                self.out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.out.flush()
+
+
+def run_batch(paths: Iterable[str], write, workers: int = 1, max_in_flight: Optional[int] = None,
+              on_file: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None, **options) -> int:
+    """Process ``paths`` and pass each file's records to ``write`` as it finishes.
+
+    ``on_file(path, records)``, if given, is called after each successful write.
+
+    At most ``max_in_flight`` files (default ``2 * workers``) are queued at
+    once, so memory stays bounded on very large batches. Returns the number
+    of files that failed. Stage timings from worker processes are merged
+    into the caller's active tracer, if any.
+    """
+    failures = 0
+    tracer = current_tracer()
+    task = _process_traced if tracer is not None else process_statement
+
+    def report(path, exc):
+        nonlocal failures
+        failures += 1
+        print(f"finfeex: {path}: {exc}", file=sys.stderr)
+
+    if workers <= 1:
+        for path in paths:
+            try:
+                records = process_statement(path, **options)
+            except Exception as exc:
+                report(path, exc)
+                continue
+            write(records)
+            if on_file is not None:
+                on_file(path, records)
+        return failures
+
+    max_in_flight = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        paths = iter(paths)
+        while True:
+            for path in paths:
+                pending[pool.submit(task, path, **options)] = path
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    records = future.result()
+                except Exception as exc:
+                    report(path, exc)
+                    continue
+                if tracer is not None:
+                    records, stages = records
+                    tracer.extend(stages)
+                write(records)
+                if on_file is not None:
+                    on_file(path, records)
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src', description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='statement files, directories or glob patterns')
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('-o', '--output', help='write here instead of stdout')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-in-flight', type=int, help='files queued at once (default: 2 x workers)')
+    parser.add_argument('--txns', type=int, default=12, help='estimated annual transactions')
+    parser.add_argument('--txn-value', type=float, default=100.0, help='assumed value per transaction')
+    parser.add_argument('--tiered', action='store_true', help='try PyPDF2 before pdfplumber')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='skip layout extraction on PDF pages without fee keywords')
+    parser.add_argument('--layouts', metavar='PATH',
+                        help='learn bank layouts into this JSON file and read matching PDFs by column')
+    parser.add_argument('--trace', action='store_true', help='print per-stage timings to stderr')
+    parser.add_argument('--profile', metavar='PATH', help='run in-process under cProfile and dump stats to PATH')
+    parser.add_argument('--history', metavar='DB',
+                        help='add each statement to this history database, skipping ones already in it')
+    args = parser.parse_args(argv)
+    if args.profile:
+        args.workers = 1  # cProfile only sees the current process
+
+    paths = iter_statement_paths(args.inputs)
+    on_file = None
+    if args.history:
+        history, digests = HistoryStore(args.history), {}
+        paths = skip_known(paths, history, digests)
+
+        def record_history(path, records):
+            history.add_statement(path, FeeBatch.from_records(records), digest=digests.pop(path, None))
+        on_file = record_history
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    # Skipped pages are counted by the tracer, so a prefiltered run is always traced.
+    trace = tracing(args.profile) if (args.trace or args.profile or args.prefilter) else nullcontext()
+    try:
+        with trace as tracer:
+            failures = run_batch(
+                paths, _Writer(out, args.format).write,
+                workers=args.workers, max_in_flight=args.max_in_flight, on_file=on_file,
+                estimated_annual_txns=args.txns, assumed_txn_value=args.txn_value, tiered=args.tiered,
+                prefilter=args.prefilter, layouts=LayoutStore(args.layouts) if args.layouts else None,
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.trace or args.profile:
+        print(format_totals(tracer.totals()), file=sys.stderr)
+    if args.prefilter:
+        skipped = sum(r['items'] or 0 for r in tracer.records if r['stage'] == 'prefilter')
+        print(f"finfeex: skipped {skipped} page(s) without fee keywords", file=sys.stderr)
+    return 1 if failures else 0
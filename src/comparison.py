@@ -0,0 +1,81 @@
+import math
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.history import HistoryStore
+
+
+def statement_labels(summaries: pd.DataFrame) -> pd.Series:
+    """Display label per statement: its name, plus the id when names repeat."""
+    names = summaries['name'].astype(str)
+    dup = names.duplicated(keep=False)
+    return names.where(~dup, names + ' (#' + summaries['id'].astype(str) + ')')
+
+
+class StatementComparison:
+    """Statement x category comparison built once from stored aggregates.
+
+    ``table`` has one row per statement (total, mean, count, rank by total)
+    and ``matrix`` holds the annual cost per category, both indexed by the
+    statement label. Everything is a single pivot / sort, so the cost grows
+    with the number of aggregate rows, not with statements x categories.
+    """
+
+    def __init__(self, summaries: pd.DataFrame, categories: pd.DataFrame):
+        labels = statement_labels(summaries)
+        table = pd.DataFrame({
+            'Statement': labels.to_numpy(),
+            'Date': summaries['date'].to_numpy(),
+            'Total Annual Cost': summaries['total'].to_numpy(dtype=float),
+            'Average Fee': summaries['mean'].fillna(0).to_numpy(dtype=float),
+            'Fee Count': summaries['count'].to_numpy(),
+        }, index=labels.to_numpy())
+        table['Rank'] = table['Total Annual Cost'].rank(method='min').astype(int)
+        self.table = table
+
+        matrix = categories.pivot_table(index='statement_id', columns='category', values='total',
+                                        aggfunc='sum', fill_value=0.0)
+        matrix = matrix.reindex(summaries['id'].to_numpy(), fill_value=0.0)
+        matrix.index = pd.Index(labels.to_numpy(), name='Statement')
+        matrix.columns.name = 'Category'
+        # Most expensive categories first
+        self.matrix = matrix[matrix.sum().sort_values(ascending=False).index]
+
+    @classmethod
+    def from_store(cls, store: HistoryStore) -> "StatementComparison":
+        return cls(store.summaries(), store.statement_categories())
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def best(self, n: int = 5) -> pd.DataFrame:
+        """The ``n`` cheapest statements by total annual cost."""
+        return self.table.nsmallest(n, 'Total Annual Cost')
+
+    def worst(self, n: int = 5) -> pd.DataFrame:
+        """The ``n`` most expensive statements by total annual cost."""
+        return self.table.nlargest(n, 'Total Annual Cost')
+
+    def top_categories(self, n: int = 10) -> pd.DataFrame:
+        """Category matrix restricted to the ``n`` costliest categories."""
+        return self.matrix.iloc[:, :n]
+
+    def savings(self) -> Optional[Dict[str, object]]:
+        """Best and worst statement and the yearly difference, or None if all cost the same."""
+        if self.table.empty:
+            return None
+        totals = self.table['Total Annual Cost']
+        best, worst = totals.idxmin(), totals.idxmax()
+        amount = totals[worst] - totals[best]
+        if amount <= 0:
+            return None
+        return {'best': best, 'worst': worst, 'amount': amount}
+
+    def pages(self, per_page: int) -> int:
+        return max(1, math.ceil(len(self.table) / per_page))
+
+    def page(self, number: int, per_page: int, order: str = 'Rank') -> pd.DataFrame:
+        """Rows of ``table`` on 1-based page ``number`` when sorted by ``order``."""
+        start = (number - 1) * per_page
+        return self.table.sort_values([order, 'Statement'], kind='stable').iloc[start:start + per_page]
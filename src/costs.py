@@ -1,59 +1,90 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterable, Union
+
+from src.fee_batch import FeeBatch
+from src.fee_detector import fast_strings
+from src.tracing import traced
+
+# Checked in order: the first frequency with a phrase in the line wins.
+FREQUENCY_KEYWORDS = [
+    ('monthly', ['monthly', 'per month', 'every month']),
+    ('yearly', ['annual', 'per year', 'yearly']),
+    ('per_txn', ['per transaction', 'per txn']),
+]
 
 
 def guess_frequency_from_line(line: str) -> str:
     l = line.lower()
-    if any(x in l for x in ['monthly', 'per month', 'every month', 'monthly)']):
-        return 'monthly'
-    if any(x in l for x in ['annual', 'per year', 'yearly', 'annually']):
-        return 'yearly'
-    if any(x in l for x in ['per transaction', 'per txn', 'per transaction', 'per txn)']):
-        return 'per_txn'
+    for freq, phrases in FREQUENCY_KEYWORDS:
+        if any(x in l for x in phrases):
+            return freq
     return 'unknown'
 
 
-def annualize_fees(detected: List[Dict[str, Any]], estimated_annual_txns: int = 0, assumed_txn_value: float = 100.0) -> pd.DataFrame:
-    rows = []
-    for d in detected:
-        line = d.get('line', '')
-        typ = d.get('type')
-        val = d.get('value')
-        freq = guess_frequency_from_line(line)
-        annual_cost = None
-        if typ == 'amount' and val is not None:
-            if freq == 'monthly':
-                annual_cost = val * 12
-            elif freq == 'yearly':
-                annual_cost = val
-            elif freq == 'per_txn':
-                # unknown transaction count — leave as NaN
-                if estimated_annual_txns:
-                    annual_cost = val * estimated_annual_txns
-                else:
-                    annual_cost = None
-            else:
-                # assume one-off
-                annual_cost = val
-        elif typ == 'percent' and val is not None:
-            # Estimate percent-based annual cost: assume estimated_annual_txns and an assumed_txn_value
-            if estimated_annual_txns:
-                # val is a percent, apply to total yearly txn volume
-                yearly_volume = estimated_annual_txns * assumed_txn_value
-                annual_cost = (val / 100.0) * yearly_volume
-            else:
-                annual_cost = None
-
-        rows.append({
-            'line': line,
-            'type': typ,
-            'value': val,
-            'frequency': freq,
-            'annual_cost_estimate': annual_cost
-        })
-
-    df = pd.DataFrame(rows)
-    # fill numeric NaNs consistently
-    if 'annual_cost_estimate' in df.columns:
-        df['annual_cost_estimate'] = pd.to_numeric(df['annual_cost_estimate'], errors='coerce')
-    return df
+def guess_frequencies(lines: pd.Series) -> np.ndarray:
+    """Vectorized :func:`guess_frequency_from_line` over a column of lines."""
+    lower = fast_strings(lines.fillna('').astype(str)).str.lower()
+    conditions = [lower.str.contains('|'.join(phrases), regex=True).to_numpy(dtype=bool, na_value=False)
+                  for _, phrases in FREQUENCY_KEYWORDS]
+    return np.select(conditions, [freq for freq, _ in FREQUENCY_KEYWORDS], default='unknown')
+
+
+def annualize_fee_frame(fees: pd.DataFrame, estimated_annual_txns: int = 0, assumed_txn_value: float = 100.0) -> pd.DataFrame:
+    """Columnar annualization of a ``line``/``type``/``value`` fee table.
+
+    Frequencies and ``annual_cost_estimate`` are computed with masked array
+    operations instead of a per-row loop:
+
+    - amounts: monthly x12, yearly and one-off as-is, per-transaction times
+      ``estimated_annual_txns`` (NaN when that is 0)
+    - percents: share of ``estimated_annual_txns * assumed_txn_value``
+      (NaN when there is no transaction estimate)
+    """
+    if fees.empty:
+        return pd.DataFrame()
+
+    line = fees['line'] if 'line' in fees.columns else pd.Series('', index=fees.index)
+    typ = fees['type'] if 'type' in fees.columns else pd.Series(None, index=fees.index, dtype=object)
+    val = fees['value'] if 'value' in fees.columns else pd.Series(None, index=fees.index, dtype=object)
+
+    freq = guess_frequencies(line)
+    amount = pd.to_numeric(val, errors='coerce').to_numpy(dtype=float)
+    is_amount = (typ == 'amount').to_numpy() & val.notna().to_numpy()
+    is_percent = (typ == 'percent').to_numpy() & val.notna().to_numpy()
+
+    txns = estimated_annual_txns or np.nan
+    amount_cost = np.select(
+        [freq == 'monthly', freq == 'per_txn'],
+        [amount * 12, amount * txns],
+        default=amount,
+    )
+    percent_cost = (amount / 100.0) * (txns * assumed_txn_value)
+    annual_cost = np.select([is_amount, is_percent], [amount_cost, percent_cost], default=np.nan)
+
+    return pd.DataFrame({
+        'line': line.to_numpy(),
+        'type': typ.to_numpy(),
+        'value': val.to_numpy(),
+        'frequency': freq,
+        'annual_cost_estimate': annual_cost,
+    })
+
+
+@traced('annualize')
+def annualize_fees(detected: Union[FeeBatch, pd.DataFrame, Iterable[Dict[str, Any]]], estimated_annual_txns: int = 0, assumed_txn_value: float = 100.0) -> Union[FeeBatch, pd.DataFrame]:
+    """Annualize detected fees; a thin wrapper around :func:`annualize_fee_frame`.
+
+    Accepts the candidate dicts from the detector or an equivalent DataFrame.
+    A :class:`FeeBatch` comes back as a FeeBatch that keeps all of its columns
+    (category, currency, ...) and gains ``frequency`` and ``annual_cost_estimate``.
+    """
+    if isinstance(detected, FeeBatch):
+        annual = annualize_fee_frame(detected.to_frame(), estimated_annual_txns, assumed_txn_value)
+        if annual.empty:
+            return detected.with_columns(frequency=[], annual_cost_estimate=[])
+        return detected.with_columns(frequency=annual['frequency'].to_numpy(),
+                                     annual_cost_estimate=annual['annual_cost_estimate'].to_numpy())
+
+    fees = detected if isinstance(detected, pd.DataFrame) else pd.DataFrame(list(detected))
+    return annualize_fee_frame(fees, estimated_annual_txns, assumed_txn_value)
@@ -0,0 +1,110 @@
+from typing import Any, Dict, Iterable, Iterator, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns: stored once per distinct value as a Categorical.
+CATEGORICAL_COLUMNS = ('type', 'currency', 'category', 'frequency')
+FLOAT_COLUMNS = ('value', 'annual_cost_estimate')
+INT_COLUMNS = ('page', 'line_no')
+COLUMN_ORDER = ('line', 'type', 'value', 'currency', 'category', 'frequency', 'annual_cost_estimate', 'page', 'line_no')
+
+
+def _as_column(name: str, values) -> Any:
+    if name in CATEGORICAL_COLUMNS:
+        return values if isinstance(values, pd.Categorical) else pd.Categorical(values)
+    if name in FLOAT_COLUMNS:
+        if isinstance(values, np.ndarray) and values.dtype == np.float64:
+            return values
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+    if name in INT_COLUMNS:
+        # nullable: text, CSV and OFX fees have no page
+        return pd.array(values, dtype='Int32')
+    return np.asarray(values, dtype=object)
+
+
+class FeeBatch:
+    """Columnar container for detected / annualized fees.
+
+    Numbers are float64 arrays (missing values are NaN), page and line
+    numbers nullable Int32 arrays, repeated strings such
+    as type, currency, category and frequency are Categoricals, and lines are
+    a single object array. Much smaller than a list of per-fee dicts, and
+    :meth:`to_frame` hands the arrays to pandas without copying them.
+    Iterating yields plain dicts, like the detector's list output.
+    """
+
+    __slots__ = ('_columns', '_length')
+
+    def __init__(self, columns: Mapping[str, Any]):
+        self._columns: Dict[str, Any] = {}
+        for name in COLUMN_ORDER:
+            if name in columns:
+                self._columns[name] = _as_column(name, columns[name])
+        for name, values in columns.items():
+            if name not in self._columns:
+                self._columns[name] = _as_column(name, values)
+        lengths = {len(col) for col in self._columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"FeeBatch columns differ in length: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> "FeeBatch":
+        records = list(records)
+        names = []
+        for r in records:
+            names.extend(k for k in r if k not in names)
+        return cls({name: [r.get(name) for r in records] for name in names})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "FeeBatch":
+        return cls({name: df[name].array if isinstance(df[name].dtype, pd.api.extensions.ExtensionDtype)
+                    else df[name].to_numpy() for name in df.columns})
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str):
+        return self._columns[name]
+
+    def with_columns(self, **columns) -> "FeeBatch":
+        """New batch sharing this one's arrays, plus/replacing ``columns``."""
+        return FeeBatch({**self._columns, **columns})
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._columns, copy=False)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Per-fee dicts with ``None`` for missing values."""
+        cols = {}
+        for name, col in self._columns.items():
+            values = col.astype(object) if isinstance(col, pd.Categorical) else col.tolist()
+            cols[name] = [None if (v is None or v is pd.NA or v != v) else v for v in values]
+        return [dict(zip(cols, row)) for row in zip(*cols.values())]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_records())
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, including line strings."""
+        total = 0
+        for name, col in self._columns.items():
+            if isinstance(col, pd.Categorical):
+                total += col.codes.nbytes + sum(len(str(c)) for c in col.categories)
+            elif col.dtype == object:
+                total += col.nbytes + sum(len(v) for v in col if isinstance(v, str))
+            else:
+                total += col.nbytes
+        return total
+
+    def __repr__(self) -> str:
+        return f"FeeBatch({self._length} fees, columns={self.columns})"
@@ -1,5 +1,11 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.fee_batch import FeeBatch
+from src.tracing import traced
 
 AMOUNT_RE = re.compile(r"(?P<currency>[₹$€£])?\s?(?P<amount>\d{1,3}(?:[\,\d]*)(?:\.\d+)?)")
 PERCENT_RE = re.compile(r"(?P<percent>\d+(?:\.\d+)?)\s?%")
@@ -14,51 +20,205 @@ FEE_KEYWORDS = [
 ]
 
 
+# Checked in order: the first category with a keyword in the line wins.
+CATEGORY_KEYWORDS = [
+    ("Foreign Exchange", ["foreign", "fx", "currency"]),
+    ("Annual/Renewal", ["annual", "renewal", "membership"]),
+    ("Account Maintenance", ["maintenance", "minimum balance"]),
+    ("Penalties", ["late payment", "penalty", "overdraft"]),
+    ("ATM/Withdrawal", ["atm", "cash withdrawal"]),
+    ("Transaction Fees", ["convenience", "processing", "transaction"]),
+    ("Communication", ["sms", "alert", "statement"]),
+]
+DEFAULT_CATEGORY = "Other Fees"
+
+_FEE_KEYWORD_SET = frozenset(FEE_KEYWORDS)
+_CATEGORY_SETS = [(name, frozenset(words)) for name, words in CATEGORY_KEYWORDS]
+_ALL_KEYWORDS = _FEE_KEYWORD_SET.union(*(words for _, words in _CATEGORY_SETS))
+# Longest alternative first, so a match at any position is the longest keyword
+# starting there; every other keyword starting there is one of its prefixes.
+_KEYWORD_RE = re.compile("|".join(re.escape(k) for k in sorted(_ALL_KEYWORDS, key=lambda k: (-len(k), k))))
+_KEYWORD_PREFIXES = {k: frozenset(p for p in _ALL_KEYWORDS if k.startswith(p)) for k in _ALL_KEYWORDS}
+
+_FEE_RE = re.compile("|".join(re.escape(k) for k in FEE_KEYWORDS))
+_CATEGORY_RES = [(name, re.compile("|".join(re.escape(k) for k in words))) for name, words in CATEGORY_KEYWORDS]
+
+
+def match_fee_line(line: str) -> Tuple[bool, str]:
+    """Return ``(has_fee_keyword, category)`` from a single keyword scan.
+
+    Equivalent to testing every FEE_KEYWORDS / CATEGORY_KEYWORDS entry as a
+    substring of the lowercased line, but the line is lowercased once and
+    scanned by one compiled alternation. Resuming each search one character
+    after the previous match start finds overlapping keywords too.
+    """
+    l = line.lower()
+    hits = set()
+    m = _KEYWORD_RE.search(l)
+    while m:
+        hits |= _KEYWORD_PREFIXES[m.group()]
+        m = _KEYWORD_RE.search(l, m.start() + 1)
+    if not hits:
+        return False, DEFAULT_CATEGORY
+
+    is_fee = not hits.isdisjoint(_FEE_KEYWORD_SET)
+    for name, words in _CATEGORY_SETS:
+        if not hits.isdisjoint(words):
+            return is_fee, name
+    return is_fee, DEFAULT_CATEGORY
+
+
 def categorize_fee(line: str) -> str:
     """Categorize fee based on keywords in the line."""
-    line_lower = line.lower()
-    
-    if any(k in line_lower for k in ["foreign", "fx", "currency"]):
-        return "Foreign Exchange"
-    elif any(k in line_lower for k in ["annual", "renewal", "membership"]):
-        return "Annual/Renewal"
-    elif any(k in line_lower for k in ["maintenance", "minimum balance"]):
-        return "Account Maintenance"
-    elif any(k in line_lower for k in ["late payment", "penalty", "overdraft"]):
-        return "Penalties"
-    elif any(k in line_lower for k in ["atm", "cash withdrawal"]):
-        return "ATM/Withdrawal"
-    elif any(k in line_lower for k in ["convenience", "processing", "transaction"]):
-        return "Transaction Fees"
-    elif any(k in line_lower for k in ["sms", "alert", "statement"]):
-        return "Communication"
-    else:
-        return "Other Fees"
+    return match_fee_line(line)[1]
+
+
+def _candidate_from_line(line: str) -> Optional[Dict[str, Any]]:
+    """Return a fee candidate for a single line, or None if it has no fee keyword."""
+    is_fee, category = match_fee_line(line)
+    if not is_fee:
+        return None
+
+    # find percent
+    p = PERCENT_RE.search(line)
+    amt = None
+
+    if p:
+        return {"line": line.strip(), "type": "percent", "value": float(p.group('percent')), "category": category}
+
+    m = AMOUNT_RE.search(line)
+    if m:
+        raw = m.group('amount').replace(',', '')
+        try:
+            amt = float(raw)
+        except Exception:
+            amt = None
+
+    return {"line": line.strip(), "type": "amount" if amt is not None else "unknown", "value": amt, "currency": m.group('currency') if m else None, "category": category}
+
+
+def detect_fees_iter(source: Iterable[Union[str, bytes, Tuple[int, str]]]) -> Iterator[Dict[str, Any]]:
+    """Lazily yield fee candidates from any iterable of lines or pages.
+
+    Items may be lines (``str``, or UTF-8 ``bytes`` as read from a binary
+    file or socket) or ``(page_number, text)`` pairs as produced by
+    :func:`src.pdf_parser.iter_pages`. Each candidate gets the ``page`` it
+    was found on (1 for plain lines) and its 1-based ``line_no`` within
+    that page. Nothing is read ahead, so the input can be arbitrarily long.
+    """
+    line_no, page = 0, 1
+    for item in source:
+        if isinstance(item, tuple):
+            page, text = item
+            for page_line_no, line in enumerate(text.splitlines(), start=1):
+                candidate = _candidate_from_line(line)
+                if candidate is not None:
+                    candidate["line_no"] = page_line_no
+                    candidate["page"] = page
+                    yield candidate
+            continue
+        line_no += 1
+        if isinstance(item, bytes):
+            item = item.decode('utf-8', errors='replace')
+        candidate = _candidate_from_line(item)
+        if candidate is not None:
+            candidate["line_no"] = line_no
+            candidate["page"] = page
+            yield candidate
+
 
+@traced('detect')
+def detect_fees_in_lines(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Like :func:`detect_fees_in_text` for input that is already split into lines."""
+    return list(detect_fees_iter(lines))
 
+
+@traced('detect')
 def detect_fees_in_text(text: str) -> List[Dict[str, Any]]:
     """Return a list of fee candidates with extracted amount/percent and context line."""
-    candidates = []
-    for line in text.splitlines():
-        l = line.lower()
-        if any(k in l for k in FEE_KEYWORDS):
-            # find percent
-            p = PERCENT_RE.search(l)
-            amt = None
-            category = categorize_fee(line)
-            
-            if p:
-                candidates.append({"line": line.strip(), "type": "percent", "value": float(p.group('percent')), "category": category})
-                continue
-
-            m = AMOUNT_RE.search(line)
-            if m:
-                raw = m.group('amount').replace(',', '')
-                try:
-                    amt = float(raw)
-                except Exception:
-                    amt = None
-
-            candidates.append({"line": line.strip(), "type": "amount" if amt is not None else "unknown", "value": amt, "currency": m.group('currency') if m else None, "category": category})
-
-    return candidates
\ No newline at end of file
+    return list(detect_fees_iter(text.splitlines()))
+
+
+def detect_fees_in_pages(pages: Iterable[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+    """Lazily yield fee candidates from ``(page_number, text)`` pairs.
+
+    Pairs with :func:`src.pdf_parser.iter_pages` so the first fees are available
+    after the first page instead of after the whole document. Each candidate
+    carries the ``page`` it was found on. See :func:`detect_fees_iter`.
+    """
+    return detect_fees_iter(pages)
+
+
+def fast_strings(s: pd.Series) -> pd.Series:
+    """Arrow-backed copy of ``s`` when pyarrow is installed (vectorized str ops)."""
+    try:
+        return s.astype('string[pyarrow]')
+    except ImportError:
+        return s
+
+
+def _to_float(s: pd.Series) -> pd.Series:
+    """``pd.to_numeric`` that also reads non-ASCII digits (e.g. ``५००``) the way ``float()`` does.
+
+    ``\\d`` in the patterns matches any Unicode decimal digit, which only
+    the per-line detector's ``float()`` understands; the few such values
+    left as NaN are converted one by one.
+    """
+    out = pd.to_numeric(s, errors='coerce')
+    redo = out.isna() & s.notna()
+    if redo.any():
+        out[redo] = s[redo].map(float)
+    return out
+
+
+@traced('detect_batch')
+def detect_fees_batch(lines) -> pd.DataFrame:
+    """Vectorized :func:`detect_fees_in_lines` over a Series/array/list of lines.
+
+    Lines may come from many statements at once: the result keeps the index
+    of each matching input line so it can be joined back to its source.
+    Returns columns ``line``, ``type``, ``value``, ``currency`` and
+    ``category`` with the same values the per-line detector produces
+    (a missing ``value`` is NaN, a missing ``currency`` is ``None``).
+
+    The keyword filter runs over every line, on Arrow strings when pyarrow is
+    available; extraction and categorization only see the lines that passed.
+    """
+    s = lines if isinstance(lines, pd.Series) else pd.Series(lines, dtype=object)
+    s = s.fillna('').astype(str)
+
+    fee_mask = fast_strings(s).str.lower().str.contains(_FEE_RE.pattern)
+    hits = s[fee_mask.to_numpy(dtype=bool, na_value=False)]
+    lower = hits.str.lower()
+
+    percent = lower.str.extract(PERCENT_RE)['percent']
+    amount = hits.str.extract(AMOUNT_RE)
+    is_percent = percent.notna().to_numpy()
+    has_amount = amount['amount'].notna().to_numpy()
+
+    value = np.where(
+        is_percent,
+        _to_float(percent),
+        _to_float(amount['amount'].str.replace(',', '', regex=False)),
+    )
+    currency = amount['currency'].astype(object)
+    currency = currency.where(currency.notna() & ~is_percent, None)
+
+    category = np.select(
+        [lower.str.contains(pattern).to_numpy(dtype=bool) for _, pattern in _CATEGORY_RES],
+        [name for name, _ in _CATEGORY_RES],
+        default=DEFAULT_CATEGORY,
+    )
+
+    return pd.DataFrame({
+        'line': hits.str.strip(),
+        'type': np.select([is_percent, has_amount], ['percent', 'amount'], default='unknown'),
+        'value': value,
+        'currency': currency,
+        'category': category,
+    }, index=hits.index)
+
+
+def detect_fee_batch(text: str) -> FeeBatch:
+    """Detect fees in ``text`` straight into a columnar :class:`FeeBatch`."""
+    return FeeBatch.from_frame(detect_fees_batch(text.splitlines()))
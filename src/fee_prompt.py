@@ -0,0 +1,115 @@
+"""Compact, token-budgeted LLM prompts built from annualized fees.
+
+Instead of the raw statement, the model sees a digest: totals, category
+sums, frequency counts and the costliest fee lines. When even the digest
+does not fit ``token_budget`` the fee lines are split into chunks that are
+summarized separately (map) and the notes are then merged (reduce).
+"""
+import math
+from typing import List
+
+import pandas as pd
+
+from src.fee_batch import FeeBatch
+
+DEFAULT_TOKEN_BUDGET = 1500
+TOP_FEES = 25
+MAX_LINE_CHARS = 120
+
+INSTRUCTIONS = (
+    "You are a helpful assistant that reviews fees found on a bank statement.\n"
+    "Using the fee digest below, list the top hidden fees and give a one-paragraph "
+    "recommendation on how to reduce them. Amounts are estimated annual costs in ₹.\n\n"
+)
+MAP_INSTRUCTIONS = (
+    "You are reviewing one part of the fees found on a bank statement.\n"
+    "In a few short bullet points, note the most expensive or unusual fees below.\n\n"
+)
+MERGE_INSTRUCTIONS = (
+    "Merge these notes on a bank statement's fees into a few short bullet points, "
+    "keeping the most expensive or unusual fees.\n\n"
+)
+REDUCE_INSTRUCTIONS = (
+    "You are a helpful assistant that reviews fees found on a bank statement.\n"
+    "Below are the statement totals and notes on its fees. List the top hidden fees "
+    "and give a one-paragraph recommendation on how to reduce them.\n\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def _money(value) -> str:
+    return f"₹{int(round(value)):,}" if pd.notna(value) else "not priced"
+
+
+def digest_header(df: pd.DataFrame) -> str:
+    """Totals, category sums and frequency counts: the part every prompt carries."""
+    annual = df['annual_cost_estimate'] if 'annual_cost_estimate' in df.columns else pd.Series(float('nan'), index=df.index)
+    lines = [f"Fee lines: {len(df)}; estimated annual total: {_money(annual.sum())}"]
+    if 'category' in df.columns and len(df):
+        by_cat = annual.groupby(df['category'], observed=True).agg(['sum', 'size']).sort_values('sum', ascending=False)
+        lines.append("Category totals:")
+        lines += [f"- {cat}: {_money(row['sum'])} ({int(row['size'])} fees)" for cat, row in by_cat.iterrows()]
+    if 'frequency' in df.columns and len(df):
+        counts = df['frequency'].value_counts()
+        lines.append("Frequencies: " + ", ".join(f"{freq} {n}" for freq, n in counts.items() if n))
+    return "\n".join(lines) + "\n"
+
+
+def fee_lines(df: pd.DataFrame) -> List[str]:
+    """One line per fee, costliest first; unpriced fees last."""
+    if 'annual_cost_estimate' in df.columns:
+        df = df.sort_values('annual_cost_estimate', ascending=False, na_position='last')
+    out = []
+    for r in df.to_dict('records'):
+        text = ' '.join(str(r.get('line', '')).split())[:MAX_LINE_CHARS]
+        parts = [text, r.get('category'), r.get('frequency'), _money(r.get('annual_cost_estimate'))]
+        out.append("- " + " | ".join(str(p) for p in parts if p is not None))
+    return out
+
+
+def pack(lines: List[str], budget: int) -> List[List[str]]:
+    """Greedily group ``lines`` so each group's text fits ``budget`` tokens."""
+    groups, current, used = [], [], 0
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if current and used + cost > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_fee_prompts(df, token_budget: int = DEFAULT_TOKEN_BUDGET, top_n: int = TOP_FEES) -> List[str]:
+    """Prompts for summarizing ``df`` (a fee DataFrame or :class:`FeeBatch`).
+
+    Returns a single prompt when the digest of the ``top_n`` costliest fees
+    fits ``token_budget``; otherwise one map prompt per chunk of fee lines,
+    each within the budget, to be merged with :func:`build_reduce_prompt`.
+    """
+    if isinstance(df, FeeBatch):
+        df = df.to_frame()
+    header = digest_header(df)
+    lines = fee_lines(df)[:top_n]
+    prompt = INSTRUCTIONS + header + "Top fees (line | category | frequency | annual):\n" + "\n".join(lines)
+    if estimate_tokens(prompt) <= token_budget:
+        return [prompt]
+    room = max(1, token_budget - estimate_tokens(MAP_INSTRUCTIONS))
+    return [MAP_INSTRUCTIONS + "\n".join(chunk) for chunk in pack(lines, room)]
+
+
+def build_merge_prompt(notes: List[str]) -> str:
+    return MERGE_INSTRUCTIONS + "\n".join(notes)
+
+
+def build_reduce_prompt(df, notes: List[str]) -> str:
+    """Final prompt combining the statement totals with the map-step ``notes``."""
+    if isinstance(df, FeeBatch):
+        df = df.to_frame()
+    return REDUCE_INSTRUCTIONS + digest_header(df) + "Notes on the fees:\n" + "\n".join(notes)
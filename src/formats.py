@@ -0,0 +1,191 @@
+import csv
+import io
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+Parser = Callable[[bytes], Iterable[str]]
+Sniffer = Callable[[bytes], bool]
+
+SNIFF_BYTES = 1024
+
+_OFX_TXN_RE = re.compile(rb"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|$)", re.S | re.I)
+_OFX_FIELD_RE = re.compile(rb"<(TRNTYPE|DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)", re.I)
+# CSV header words for the columns a fee line is built from
+DESCRIPTION_LABELS = ('description', 'particulars', 'narration', 'details', 'memo', 'name', 'remarks')
+AMOUNT_LABELS = ('amount', 'debit', 'withdrawal', 'charge', 'fee')
+DATE_LABELS = ('date',)
+_DATE_RE = r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|\d{1,2}[-/ ][A-Za-z]{3,9}[-/ ]\d{2,4}"
+_NUMBER_RE = r"[-+]?[\d,]*\.?\d*"
+# Any digit or currency sign: a row holding one is data, never a header.
+_AMOUNT_TOKEN_RE = re.compile(r"[\d₹$€£]")
+# Words that name CSV columns. 'fee' and 'charge' only count as a whole
+# cell, as fee descriptions ("Annual fee") use them too.
+_HEADER_WORDS = frozenset(DESCRIPTION_LABELS + AMOUNT_LABELS + DATE_LABELS + (
+    'credit', 'balance', 'ref', 'reference', 'no', 'id', 'type', 'category', 'currency', 'value', 'txn',
+    'transaction', 'posted', 'cheque', 'mode')) - {'fee', 'charge'}
+# OFX transaction types that are fees by definition, spelled the way FEE_KEYWORDS expects
+_OFX_FEE_TYPES = {'FEE': 'fee', 'SRVCHG': 'service charge'}
+
+
+def parse_text(data: bytes) -> List[str]:
+    return data.decode('utf-8', errors='replace').splitlines()
+
+
+def _header_has(name: str, labels) -> bool:
+    name = str(name).strip().lower()
+    return any(label in name for label in labels)
+
+
+def _date_column(name, cells: pd.Series) -> bool:
+    if _header_has(name, DATE_LABELS):
+        return True
+    values = cells[cells != '']
+    return not values.empty and values.str.fullmatch(_DATE_RE).all()
+
+
+def _is_label(cell: str) -> bool:
+    cell = cell.lower()
+    if re.fullmatch(r"(?:fee|charge)s?", cell):
+        return True
+    return any(w in _HEADER_WORDS or w[:-1] in _HEADER_WORDS and w.endswith('s')
+               for w in re.findall(r"[a-z]+", cell))
+
+
+def _has_header(data: bytes) -> bool:
+    """Is the first CSV row a header? When unsure, it is kept as data.
+
+    Never when a cell holds a digit or currency sign. Otherwise it is one
+    when most of its cells name columns (whole words such as ``Txn Date``
+    or ``Narration``), or when ``csv.Sniffer`` says so.
+    """
+    sample = data[:SNIFF_BYTES * 8].decode('utf-8', errors='replace')
+    first = [cell.strip() for cell in next(csv.reader(io.StringIO(sample)), []) if cell.strip()]
+    if not first or any(_AMOUNT_TOKEN_RE.search(c) for c in first):
+        return False
+    if sum(map(_is_label, first)) * 2 > len(first):
+        return True
+    try:
+        return csv.Sniffer().has_header(sample)
+    except csv.Error:
+        return False
+
+
+def parse_csv(data: bytes) -> List[str]:
+    """Turn each CSV row into one detector line, ``description amount others``.
+
+    Date columns (by header or by content) are dropped so the detector
+    does not read a date as the amount. When the header names a
+    description and an amount/debit column, those lead the line and other
+    purely numeric columns (balances, reference numbers) are left out;
+    otherwise the remaining cells are joined in file order. The first row
+    is only read as a header when :func:`_has_header` says so. The join runs
+    column-wise in pandas rather than row by row in Python. Falls back to
+    plain text lines if the data doesn't parse as CSV.
+    """
+    try:
+        df = pd.read_csv(io.BytesIO(data), header=0 if _has_header(data) else None,
+                         dtype=str, keep_default_na=False,
+                         skipinitialspace=True, encoding_errors='replace')
+    except Exception:
+        return parse_text(data)
+    if df.empty:
+        return []
+    # quoted cells may span lines; each row must stay one line
+    df = df.apply(lambda col: col.str.split().str.join(' '))
+    kept = [c for c in df.columns if not _date_column(c, df[c])]
+    description = [c for c in kept if _header_has(c, DESCRIPTION_LABELS)]
+    amount = [c for c in kept if _header_has(c, AMOUNT_LABELS) and c not in description]
+    if description and amount:
+        rest = [c for c in kept if c not in description and c not in amount
+                and not df[c].str.fullmatch(_NUMBER_RE).all()]
+        kept = description + amount + rest
+    if not kept:
+        return [''] * len(df)
+    cells = df[kept].replace('', None)
+    lines = cells.iloc[:, 0].fillna('')
+    if len(kept) > 1:
+        lines = lines.str.cat(cells.iloc[:, 1:], sep='  ', na_rep='')
+    return lines.str.split().str.join(' ').tolist()
+
+
+def parse_ofx(data: bytes) -> List[str]:
+    """Turn each OFX/QFX ``<STMTTRN>`` into ``name memo amount date`` lines."""
+    lines = []
+    for block in _OFX_TXN_RE.findall(data):
+        fields = {k.upper().decode(): v.strip().decode('utf-8', errors='replace')
+                  for k, v in _OFX_FIELD_RE.findall(block)}
+        parts = [fields.get('NAME', ''), fields.get('MEMO', '')]
+        fee_type = _OFX_FEE_TYPES.get(fields.get('TRNTYPE', '').upper())
+        if fee_type:
+            parts.append(f"({fee_type})")
+        parts.append(fields.get('TRNAMT', '').lstrip('+-'))
+        parts.append(fields.get('DTPOSTED', '')[:8])
+        lines.append(' '.join(p for p in parts if p))
+    return lines
+
+
+def _looks_like_pdf(head: bytes) -> bool:
+    return b'%PDF-' in head
+
+
+def _looks_like_ofx(head: bytes) -> bool:
+    upper = head.upper()
+    return b'OFXHEADER' in upper or b'<OFX>' in upper
+
+
+def _looks_like_csv(head: bytes) -> bool:
+    rows = [r for r in head.splitlines()[:5] if r.strip()]
+    if len(rows) < 2:
+        return False
+    counts = {r.count(b',') for r in rows[:-1]}  # last row may be truncated
+    return len(counts) == 1 and counts.pop() > 0
+
+
+# Checked in order; the first match wins.
+SNIFFERS: List[tuple] = [
+    ('pdf', _looks_like_pdf),
+    ('ofx', _looks_like_ofx),
+]
+
+EXTENSIONS: Dict[str, str] = {
+    '.pdf': 'pdf',
+    '.ofx': 'ofx',
+    '.qfx': 'ofx',
+    '.csv': 'csv',
+    '.txt': 'txt',
+}
+
+PARSERS: Dict[str, Parser] = {
+    'txt': parse_text,
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def register_parser(kind: str, parser: Parser, sniffer: Optional[Sniffer] = None,
+                    extensions: Iterable[str] = ()) -> None:
+    """Add or replace the parser for ``kind``.
+
+    ``sniffer`` is tried on the first bytes of a file before any extension
+    check; ``extensions`` (e.g. ``'.tsv'``) map file names to ``kind``.
+    """
+    PARSERS[kind] = parser
+    if sniffer is not None:
+        SNIFFERS.insert(0, (kind, sniffer))
+    for ext in extensions:
+        EXTENSIONS[ext.lower()] = kind
+
+
+def sniff_format(head: bytes, filename: str = '') -> str:
+    """Guess a statement's format from its leading bytes, then its file name."""
+    for kind, sniffer in SNIFFERS:
+        if sniffer(head):
+            return kind
+    dot = filename.rfind('.')
+    if dot != -1 and filename[dot:].lower() in EXTENSIONS:
+        return EXTENSIONS[filename[dot:].lower()]
+    if _looks_like_csv(head):
+        return 'csv'
+    return 'txt'
@@ -0,0 +1,249 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, MutableMapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.fee_batch import FeeBatch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    digest TEXT,
+    total REAL NOT NULL,
+    mean REAL,
+    count INTEGER NOT NULL,
+    priced INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS statements_date ON statements (date, id);
+CREATE TABLE IF NOT EXISTS statement_categories (
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (statement_id, category)
+);
+CREATE INDEX IF NOT EXISTS statement_categories_category ON statement_categories (category);
+CREATE TABLE IF NOT EXISTS fees (
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    line TEXT,
+    type TEXT,
+    value REAL,
+    currency TEXT,
+    category TEXT,
+    frequency TEXT,
+    annual_cost_estimate REAL
+);
+CREATE INDEX IF NOT EXISTS fees_statement ON fees (statement_id);
+"""
+# One row per distinct statement content; created separately so older
+# databases can be de-duplicated first (see HistoryStore._index_digests).
+DIGEST_INDEX = 'CREATE UNIQUE INDEX IF NOT EXISTS statements_digest ON statements (digest) WHERE digest IS NOT NULL'
+FEE_COLUMNS = ('line', 'type', 'value', 'currency', 'category', 'frequency', 'annual_cost_estimate')
+
+
+def statement_aggregates(fees: FeeBatch) -> Dict[str, Any]:
+    """Total, mean, counts and per-category sums of one statement's annual costs.
+
+    ``mean`` is over priced fees only (NaN estimates are skipped, as in pandas)
+    and is ``None`` when nothing could be priced.
+    """
+    annual = fees['annual_cost_estimate'] if 'annual_cost_estimate' in fees else np.full(len(fees), np.nan)
+    priced = int(np.count_nonzero(~np.isnan(annual)))
+    total = float(np.nansum(annual))
+    categories = {}
+    if 'category' in fees and len(fees):
+        by_cat = pd.Series(annual).groupby(np.asarray(fees['category']), sort=True)
+        sums, sizes = by_cat.sum(), by_cat.size()
+        categories = {cat: (float(sums[cat]), int(sizes[cat])) for cat in sums.index}
+    return {
+        'total': total,
+        'mean': total / priced if priced else None,
+        'count': len(fees),
+        'priced': priced,
+        'categories': categories,
+    }
+
+
+class HistoryStore:
+    """SQLite-backed history of analyzed statements.
+
+    Aggregates (total, mean, fee count, per-category sums) are computed once
+    when a statement is added, so the sidebar and the Analytics page read a
+    few indexed rows instead of every fee. The fee rows are kept too, for
+    detail tables. ``path`` defaults to an in-memory database.
+
+    Statements are keyed by content digest: adding the same bytes twice,
+    under any name, returns the existing entry. The digest -> id index is
+    kept in memory so the check is a dict lookup; it is dropped whenever
+    another connection to the same file changes it.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        if path != ':memory:':
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA foreign_keys = ON')
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.executescript(SCHEMA)
+            self._index_digests()
+        self._data_version = self._query('PRAGMA data_version')[0][0]
+        self._by_digest: Dict[str, int] = {
+            row['digest']: row['id'] for row in self._query('SELECT digest, id FROM statements WHERE digest IS NOT NULL')}
+
+    def _index_digests(self) -> None:
+        try:
+            self._conn.execute(DIGEST_INDEX)
+        except sqlite3.IntegrityError:
+            # Histories written before statements were keyed by digest may
+            # hold the same content twice; keep the first copy.
+            self._conn.execute(
+                'DELETE FROM statements WHERE digest IS NOT NULL AND id NOT IN '
+                '(SELECT MIN(id) FROM statements WHERE digest IS NOT NULL GROUP BY digest)')
+            self._conn.execute(DIGEST_INDEX)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def version(self) -> tuple:
+        """Changes whenever the stored history does (here or via another connection)."""
+        with self._lock:
+            return self._writes, self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._query('SELECT COUNT(*) FROM statements')[0][0]
+
+    def find(self, digest: str) -> Optional[int]:
+        """Id of the statement with this content digest, if it is stored."""
+        with self._lock:
+            # Another connection to the same file may have added or removed it.
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != self._data_version:
+                self._by_digest.clear()
+                self._data_version = data_version
+            sid = self._by_digest.get(digest)
+            if sid is None:
+                row = self._conn.execute('SELECT id FROM statements WHERE digest = ?', (digest,)).fetchone()
+                if row is not None:
+                    sid = self._by_digest[digest] = row['id']
+        return sid
+
+    def __contains__(self, digest: str) -> bool:
+        return self.find(digest) is not None
+
+    def add_statement(self, name: str, fees: FeeBatch, date: Optional[str] = None,
+                      digest: Optional[str] = None) -> int:
+        """Store a statement's fees and aggregates; returns its statement id.
+
+        With a ``digest`` already in the history nothing is written and the
+        existing id is returned.
+        """
+        if digest is not None:
+            sid = self.find(digest)
+            if sid is not None:
+                return sid
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        agg = statement_aggregates(fees)
+        rows = [tuple(r.get(c) for c in FEE_COLUMNS) for r in fees.to_records()]
+        try:
+            sid = self._insert(name, date, digest, agg, rows)
+        except sqlite3.IntegrityError:
+            # Lost a race with another connection adding the same content.
+            return self.find(digest)
+        if digest is not None:
+            self._by_digest[digest] = sid
+        return sid
+
+    def _insert(self, name, date, digest, agg, rows) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                'INSERT INTO statements (name, date, digest, total, mean, count, priced) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (name, date, digest, agg['total'], agg['mean'], agg['count'], agg['priced']))
+            sid = cur.lastrowid
+            self._conn.executemany(
+                'INSERT INTO statement_categories (statement_id, category, total, count) VALUES (?, ?, ?, ?)',
+                [(sid, cat, total, n) for cat, (total, n) in agg['categories'].items()])
+            self._conn.executemany(
+                f"INSERT INTO fees (statement_id, {', '.join(FEE_COLUMNS)}) VALUES (?{', ?' * len(FEE_COLUMNS)})",
+                [(sid,) + row for row in rows])
+            self._writes += 1
+        return sid
+
+    def overall(self) -> Dict[str, Any]:
+        """Totals across every stored statement."""
+        row = self._query(
+            'SELECT COUNT(*) AS statements, COALESCE(SUM(total), 0) AS total, '
+            'COALESCE(SUM(count), 0) AS count, COALESCE(SUM(priced), 0) AS priced FROM statements')[0]
+        categories = self._query('SELECT COUNT(DISTINCT category) FROM statement_categories')[0][0]
+        return {
+            'statements': row['statements'],
+            'total': row['total'],
+            'mean': row['total'] / row['priced'] if row['priced'] else 0.0,
+            'count': row['count'],
+            'categories': categories,
+        }
+
+    def summaries(self) -> pd.DataFrame:
+        """One row per statement (id, name, date, total, mean, count), oldest first."""
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT id, name, date, total, mean, count FROM statements ORDER BY date, id', self._conn,
+                dtype={'total': float, 'mean': float})
+
+    def category_totals(self) -> pd.DataFrame:
+        """Annual cost per category summed over all statements, largest first."""
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT category, SUM(total) AS total, SUM(count) AS count FROM statement_categories '
+                'GROUP BY category ORDER BY total DESC', self._conn)
+
+    def statement_categories(self) -> pd.DataFrame:
+        """Per-statement category sums in long form (statement_id, category, total, count)."""
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT statement_id, category, total, count FROM statement_categories '
+                'ORDER BY statement_id, category', self._conn)
+
+    def fees(self, limit: Optional[int] = None, offset: int = 0) -> pd.DataFrame:
+        """Stored fee rows with their statement name, newest statements first."""
+        sql = (f"SELECT s.name AS statement, s.date, {', '.join('f.' + c for c in FEE_COLUMNS)} "
+               'FROM fees f JOIN statements s ON s.id = f.statement_id ORDER BY s.date DESC, s.id DESC, f.rowid')
+        if limit is not None:
+            sql += f' LIMIT {int(limit)} OFFSET {int(offset)}'
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM statements')
+            self._writes += 1
+            self._by_digest.clear()
+
+
+def session_history(session_state: MutableMapping[str, Any]) -> HistoryStore:
+    """The history store for a Streamlit session, opened on first use.
+
+    Set FINFEEX_HISTORY_DB to a file path to keep history between runs;
+    otherwise each session gets its own in-memory store.
+    """
+    store = session_state.get('history_store')
+    if store is None:
+        store = HistoryStore(os.environ.get('FINFEEX_HISTORY_DB') or ':memory:')
+        session_state['history_store'] = store
+    return store
@@ -0,0 +1,278 @@
+"""Per-bank statement layouts learned once and reused for later statements.
+
+Statements from the same bank put the description and amount in the same
+columns. :func:`learn_layout` finds the column header on a page and the
+column bounding boxes under it; later PDFs with the same
+:func:`fingerprint` are read by cropping just those columns, so each row
+comes back as ``description amount`` instead of a whole-page text layout
+with dates and balances merged into the line.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from pdfminer.pdftypes import resolve1
+
+DESCRIPTION_LABELS = ('description', 'particulars', 'narration', 'details')
+AMOUNT_LABELS = ('amount', 'debit', 'withdrawal', 'charges')
+COLUMNS = ('description', 'amount')
+# Pages searched for the column header when learning or checking a layout.
+HEADER_PAGES = 3
+# Words whose tops are this close (in points) are on the same row.
+ROW_TOLERANCE = 3.0
+
+_SUBSET_PREFIX = re.compile(r'^[A-Z]{6}\+')
+
+Template = Dict[str, Any]
+
+
+def fingerprint(pdf) -> str:
+    """Layout key of an open pdfplumber PDF: producer, first-page size and fonts.
+
+    Reads only the document info and the first page's resources, so it is
+    cheap enough to compute for every upload.
+    """
+    page = pdf.pages[0]
+    fonts = resolve1((page.page_obj.resources or {}).get('Font')) or {}
+    names = sorted({_SUBSET_PREFIX.sub('', str(getattr(resolve1(resolve1(f).get('BaseFont')), 'name', '')))
+                    for f in fonts.values()})
+    meta = pdf.metadata or {}
+    key = [str(meta.get('Producer', '')), str(meta.get('Creator', '')),
+           round(float(page.width)), round(float(page.height)), names]
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()[:16]
+
+
+def _rows(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group pdfplumber words into rows by their top, each row left to right."""
+    rows: List[List[Dict[str, Any]]] = []
+    for w in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if rows and w['top'] - rows[-1][0]['top'] <= ROW_TOLERANCE:
+            rows[-1].append(w)
+        else:
+            rows.append([w])
+    return [sorted(row, key=lambda w: w['x0']) for row in rows]
+
+
+def _text(row: List[Dict[str, Any]]) -> str:
+    return ' '.join(w['text'] for w in row)
+
+
+def _header_cells(row: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge a header row's words into cells; words closer than their height share a cell."""
+    cells: List[Dict[str, Any]] = []
+    for w in row:
+        if cells and w['x0'] - cells[-1]['x1'] < w['bottom'] - w['top']:
+            cells[-1]['text'] += ' ' + w['text']
+            cells[-1]['x1'] = w['x1']
+        else:
+            cells.append({'text': w['text'], 'x0': w['x0'], 'x1': w['x1']})
+    return cells
+
+
+def _find_cell(cells, labels, skip=None) -> Optional[Dict[str, Any]]:
+    return next((c for c in cells if c is not skip and any(l in c['text'].lower() for l in labels)), None)
+
+
+def _gutter(words: List[Dict[str, Any]], left: Dict[str, Any], right: Dict[str, Any]) -> float:
+    """Column edge between two header cells.
+
+    The x between the end of ``left`` and the end of ``right`` crossed by
+    the fewest body words, nearest to where ``right`` starts, so both
+    left- and right-aligned columns are split at their whitespace.
+    """
+    lo, hi = math.floor(left['x1']), math.ceil(right['x1'])
+    cover = np.zeros(max(hi - lo, 1))
+    for w in words:
+        a, b = max(math.floor(w['x0']), lo), min(math.ceil(w['x1']), hi)
+        if a < b:
+            cover[a - lo:b - lo] += 1
+    x = np.arange(len(cover)) + lo + 0.5
+    best = np.lexsort((np.abs(x - right['x0']), cover))[0]
+    return float(x[best])
+
+
+def learn_layout(page) -> Optional[Template]:
+    """Template for a pdfplumber page with a description/amount column header, else None.
+
+    The template holds the header labels and, per column, a bounding box
+    ``[x0, top, x1, bottom]`` spanning the page height.
+    """
+    rows = _rows(page.extract_words())
+    for i, row in enumerate(rows):
+        cells = _header_cells(row)
+        description = _find_cell(cells, DESCRIPTION_LABELS)
+        amount = _find_cell(cells, AMOUNT_LABELS, skip=description)
+        if description is None or amount is None:
+            continue
+        body = [w for r in rows[i + 1:] for w in r]
+        edges = [0.0] + [_gutter(body, a, b) for a, b in zip(cells, cells[1:])] + [float(page.width)]
+        columns, labels = {}, {}
+        for name, cell in zip(COLUMNS, (description, amount)):
+            k = cells.index(cell)
+            columns[name] = [edges[k], 0.0, edges[k + 1], float(page.height)]
+            labels[name] = cell['text'].lower()
+        return {'labels': labels, 'columns': columns}
+    return None
+
+
+def _column_rows(page, template: Template) -> Dict[str, List[List[Dict[str, Any]]]]:
+    rows = {}
+    for name in COLUMNS:
+        x0, top, x1, bottom = template['columns'][name]
+        bbox = (max(x0, 0), max(top, 0), min(x1, float(page.width)), min(bottom, float(page.height)))
+        rows[name] = _rows(page.within_bbox(bbox).extract_words())
+    return rows
+
+
+def _header_top(rows, template: Template) -> Optional[float]:
+    """Top of the row where both columns show their header label, if any."""
+    tops = {name: [r[0]['top'] for r in rows[name] if _text(r).lower() == template['labels'][name]]
+            for name in COLUMNS}
+    for top in tops['description']:
+        if any(abs(top - t) <= ROW_TOLERANCE for t in tops['amount']):
+            return top
+    return None
+
+
+def has_header(page, template: Template) -> bool:
+    """Does the page show ``template``'s column header inside its column boxes?"""
+    return _header_top(_column_rows(page, template), template) is not None
+
+
+def iter_layout_lines(page, template: Template) -> Iterator[str]:
+    """Rows of a page read from the template's column crops, ``description amount``.
+
+    On pages that repeat the column header, everything down to it (account
+    details and the like) is left out.
+    """
+    rows = _column_rows(page, template)
+    header = _header_top(rows, template)
+    start = header + ROW_TOLERANCE if header is not None else float('-inf')
+    cells = sorted((row[0]['top'], COLUMNS.index(name), _text(row))
+                   for name in COLUMNS for row in rows[name] if row[0]['top'] > start)
+    merged: List[List[Any]] = []
+    for top, col, text in cells:
+        if merged and top - merged[-1][0] <= ROW_TOLERANCE and col not in merged[-1][1]:
+            merged[-1][1][col] = text
+        else:
+            merged.append([top, {col: text}])
+    for _, parts in merged:
+        yield ' '.join(parts[col] for col in sorted(parts))
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Exclusive lock on ``path`` shared by every process using it."""
+    with open(path, 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _load(path: str) -> Dict[str, Optional[Template]]:
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+class LayoutStore:
+    """Learned layout templates keyed by :func:`fingerprint`.
+
+    With ``path`` the templates are kept in that JSON file, so a bank's
+    layout is learned once across runs; a fingerprint whose statements had
+    no recognizable column header is remembered too, as ``None``. Pickles
+    as its path, so worker processes reopen the same file; each write
+    merges with what other processes stored, under a lock file next to it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path) if path else None
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Optional[Template]] = _load(self.path) if self.path else {}
+
+    def __reduce__(self):
+        return LayoutStore, (self.path,)
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._templates
+
+    def get(self, key: str) -> Optional[Template]:
+        return self._templates.get(key)
+
+    def put(self, key: str, template: Optional[Template]) -> None:
+        """Remember ``template`` and, with a ``path``, persist it.
+
+        A failed write only loses the template for other runs; it never
+        fails the extraction that learned it.
+        """
+        with self._lock:
+            self._templates[key] = template
+            if not self.path:
+                return
+            try:
+                self._persist(key, template)
+            except OSError:
+                pass
+
+    def _persist(self, key: str, template: Optional[Template]) -> None:
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        with _locked(self.path + '.lock'):
+            stored = _load(self.path)
+            stored[key] = template
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=folder, suffix='.tmp',
+                                             delete=False) as fh:
+                json.dump(stored, fh)
+            try:
+                os.replace(fh.name, self.path)
+            except OSError:
+                os.unlink(fh.name)
+                raise
+        self._templates = {**stored, **self._templates}
+
+    def template_for(self, pdf) -> Optional[Template]:
+        """Template to read ``pdf`` with, learning it on first sight of its layout.
+
+        A stored template is used only if its header is found on one of the
+        first :data:`HEADER_PAGES` pages; otherwise it is learned again.
+        """
+        try:
+            key = fingerprint(pdf)
+        except Exception:
+            return None
+        pages = pdf.pages[:HEADER_PAGES]
+        if key in self:
+            template = self.get(key)
+            if template is None or any(has_header(page, template) for page in pages):
+                return template
+        template = next((t for t in map(learn_layout, pages) if t is not None), None)
+        self.put(key, template)
+        return template
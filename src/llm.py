@@ -0,0 +1,92 @@
+"""LLM access for the optional AI summary: a pluggable async client, a
+response cache and a timeout around every call.
+
+Anything with an ``async complete(prompt, max_tokens=...)`` method can be
+used as the client, e.g. a stub in tests or an OpenAI-compatible server on
+localhost via ``OpenAIClient(base_url=...)``.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Protocol, Tuple
+
+DEFAULT_MODEL = 'gpt-3.5-turbo'
+DEFAULT_TIMEOUT = 15.0
+
+
+class LLMClient(Protocol):
+    model: str
+
+    async def complete(self, prompt: str, max_tokens: int = 300) -> str:
+        ...
+
+
+class OpenAIClient:
+    """Chat-completions client on ``openai.AsyncOpenAI`` (openai>=1)."""
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, base_url: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        import openai
+        self.model = model
+        self._client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+    async def complete(self, prompt: str, max_tokens: int = 300) -> str:
+        resp = await self._client.chat.completions.create(
+            model=self.model, messages=[{"role": "user", "content": prompt}], max_tokens=max_tokens)
+        return (resp.choices[0].message.content or '').strip()
+
+
+def prompt_key(model: str, prompt: str, max_tokens: int) -> str:
+    return hashlib.sha256(f"{model}\0{max_tokens}\0{prompt}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU of LLM responses keyed by prompt hash; entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int = 128, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+async def complete_cached(client: LLMClient, prompt: str, max_tokens: int = 300,
+                          cache: Optional[ResponseCache] = None, timeout: float = DEFAULT_TIMEOUT) -> str:
+    """``client.complete`` with a response cache and a hard timeout.
+
+    Raises :class:`asyncio.TimeoutError` when the call takes longer than
+    ``timeout`` seconds; the pending request is cancelled.
+    """
+    key = prompt_key(getattr(client, 'model', ''), prompt, max_tokens)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    result = await asyncio.wait_for(client.complete(prompt, max_tokens=max_tokens), timeout)
+    if cache is not None:
+        cache.put(key, result)
+    return result
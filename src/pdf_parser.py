@@ -1,26 +1,471 @@
+import codecs
 import io
+import logging
+import mmap
+import os
+import re
+import stat
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
 import pdfplumber
-import io
-import pdfplumber
+from pdfminer.pdfdevice import PDFDevice
+from pdfminer.pdfinterp import PDFPageInterpreter
+
+from src.fee_detector import AMOUNT_RE, FEE_KEYWORDS, PERCENT_RE, detect_fees_iter
+from src.formats import PARSERS, SNIFF_BYTES, parse_text, sniff_format
+from src.layouts import LayoutStore, iter_layout_lines
+from src.tracing import count_lines, current_tracer, traced
+
+# Below this many pages the cost of starting worker processes outweighs the gain.
+PARALLEL_MIN_PAGES = 24
+# Bytes decoded at a time by iter_text_lines.
+STREAM_CHUNK_BYTES = 1 << 20
+# Characters str.splitlines() breaks on.
+_LINE_BREAKS = frozenset('\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029')
+
+PdfSource = Union[str, os.PathLike, bytes]
+
+logger = logging.getLogger(__name__)
+
+# Spaces are often drawn by moving the pen, so keywords are matched without them.
+_FEE_SCAN_RE = re.compile("|".join(re.escape(k.replace(' ', '')) for k in FEE_KEYWORDS))
+# Fee keywords that also title pages ("Account Statement - Acme Bank", "Customer Service").
+_HEADER_KEYWORDS = frozenset({'statement', 'service'})
+_ROW_FEE_RE = re.compile("|".join(re.escape(k) for k in FEE_KEYWORDS if k not in _HEADER_KEYWORDS))
+
+
+def _read_as_text(uploaded_file) -> str:
+    try:
+        uploaded_file.seek(0)
+        data = uploaded_file.read()
+        if isinstance(data, bytes):
+            return data.decode('utf-8', errors='replace')
+        return data
+    except Exception:
+        return ""
+
+
+def _iter_chunks(source, chunk_size: int) -> Iterator[Union[bytes, str]]:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            yield from _iter_chunks(fh, chunk_size)
+        return
+    try:
+        fileno = source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    st = os.fstat(fileno) if fileno is not None else None
+    if st is not None and stat.S_ISREG(st.st_mode) and st.st_size:
+        # Regular file: map it and let the OS page it in as the slices are read.
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, st.st_size, chunk_size):
+                yield mm[start:start + chunk_size]
+        return
+    # Pipes, sockets and empty files are read as a stream.
+    if getattr(source, 'seekable', lambda: False)():
+        source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_text_lines(source, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[str]:
+    """Yield the lines of a UTF-8 text file without holding it in memory.
+
+    ``source`` is a path or a file object; real files are memory-mapped,
+    anything else is read ``chunk_size`` bytes at a time. Decoding is
+    incremental, so multi-byte characters split across chunks survive, and
+    lines are split exactly like ``str.splitlines`` on the whole text.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    carry = ''
+    for chunk in _iter_chunks(source, chunk_size):
+        text = carry + (chunk if isinstance(chunk, str) else decoder.decode(chunk))
+        if not text:
+            continue
+        lines = text.splitlines()
+        # The last line may continue in the next chunk: it has no line break
+        # yet, or ends in a '\r' whose '\n' has not been read.
+        if text[-1] == '\r':
+            carry = lines.pop() + '\r'
+        elif text[-1] not in _LINE_BREAKS:
+            carry = lines.pop()
+        else:
+            carry = ''
+        yield from lines
+    carry += decoder.decode(b'', final=True)
+    yield from carry.splitlines()
+
+
+@traced('detect_stream')
+def detect_fees_in_text_file(source, chunk_size: int = STREAM_CHUNK_BYTES) -> List[Dict[str, Any]]:
+    """Fee candidates of a plain-text statement, streamed line by line.
+
+    Same result as ``detect_fees_in_text(extract_text_from_pdf_or_text(f))``
+    for text input, but only one chunk of the file is in memory at a time.
+    """
+    return list(detect_fees_iter(iter_text_lines(source, chunk_size)))
+
+
+def detect_format(uploaded_file) -> str:
+    """Sniff an upload's format (see :func:`src.formats.sniff_format`) without consuming it."""
+    try:
+        uploaded_file.seek(0)
+        head = uploaded_file.read(SNIFF_BYTES)
+        uploaded_file.seek(0)
+    except Exception:
+        return 'txt'
+    if isinstance(head, str):
+        return 'txt'
+    return sniff_format(head, getattr(uploaded_file, 'name', '') or '')
+
+
+def _read_lines(uploaded_file, kind: str) -> List[str]:
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    if isinstance(data, str):
+        return data.splitlines()
+    return list(PARSERS.get(kind, parse_text)(data))
+
+
+def _read_non_pdf(uploaded_file, kind: str) -> str:
+    if kind == 'txt':
+        return _read_as_text(uploaded_file)
+    try:
+        return "\n".join(_read_lines(uploaded_file, kind))
+    except Exception:
+        return _read_as_text(uploaded_file)
+
+
+def iter_statement_lines(uploaded_file) -> Iterator[str]:
+    """Yield the statement's lines using the parser for its sniffed format.
+
+    CSV and OFX rows come straight from their parsers instead of being
+    joined into one text blob first.
+    """
+    kind = detect_format(uploaded_file)
+    if kind == 'pdf':
+        for _, text in iter_pages(uploaded_file):
+            yield from text.splitlines()
+    elif kind == 'txt':
+        yield from iter_text_lines(uploaded_file)
+    else:
+        yield from _read_lines(uploaded_file, kind)
+
+
+class _ShownText(PDFDevice):
+    """pdfminer device that keeps only the characters a page shows.
+
+    Strings are decoded through each font's encoding and ``ToUnicode`` map,
+    as for layout analysis, but no glyph is measured or placed.
+    """
+
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.chars: List[str] = []
+
+    def render_string(self, textstate, seq, ncs, graphicstate) -> None:
+        font = textstate.font
+        for obj in seq:
+            if isinstance(obj, bytes):
+                self.chars.extend(font.to_unichr(cid) for cid in font.decode(obj))
+
+
+def page_may_have_fees(page) -> bool:
+    """Cheap check of a pdfplumber page for fee keywords, without layout analysis.
+
+    Runs the page's content streams (form XObjects included) through
+    pdfminer with a device that only decodes the strings drawn, through the
+    same fonts layout extraction uses, and looks for a ``FEE_KEYWORDS``
+    entry, the only thing the detector needs to report a line. Only pages
+    whose text can be read reliably this way are ruled out; anything in
+    doubt (a glyph without a Unicode mapping, mostly non-printable text, a
+    stream that cannot be interpreted) returns True.
+    """
+    rsrcmgr = page.pdf.rsrcmgr
+    device = _ShownText(rsrcmgr)
+    try:
+        PDFPageInterpreter(rsrcmgr, device).process_page(page.page_obj)
+    except Exception:
+        return True
+    text = re.sub(r'\s+', '', ''.join(device.chars))
+    if sum(1 for ch in text if not ch.isprintable()) > 0.1 * len(text):
+        return True
+    return _FEE_SCAN_RE.search(text.lower()) is not None
+
 
-def extract_text_from_pdf_or_text(uploaded_file) -> str:
+def _timed_may_have_fees(page) -> Tuple[bool, float, float]:
+    """:func:`page_may_have_fees` with the wall/CPU seconds it took."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    candidate = page_may_have_fees(page)
+    return candidate, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def iter_pages(uploaded_file, prefilter: bool = False,
+               layouts: Optional[LayoutStore] = None) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_number, text)`` one page at a time, starting at 1.
+
+    Each pdfplumber page is released once its text has been yielded, so memory
+    stays flat on long statements. Non-PDF input is yielded as a single page
+    without attempting a PDF parse.
+
+    With ``prefilter`` pages that :func:`page_may_have_fees` rules out skip
+    layout extraction and are yielded with empty text; the number skipped
+    is logged, and recorded as the ``prefilter`` stage's items when tracing.
+
+    With ``layouts``, a PDF whose bank layout is known (or can be learned,
+    see :meth:`src.layouts.LayoutStore.template_for`) is read one
+    ``description amount`` row per line from its column crops instead.
+    """
+    kind = detect_format(uploaded_file)
+    if kind != 'pdf':
+        yield 1, _read_non_pdf(uploaded_file, kind)
+        return
+
+    try:
+        uploaded_file.seek(0)
+        pdf = pdfplumber.open(uploaded_file)
+    except Exception:
+        yield 1, _read_as_text(uploaded_file)
+        return
+
+    skipped, wall, cpu = 0, 0.0, 0.0
+    with pdf:
+        template = layouts.template_for(pdf) if layouts is not None else None
+        total = len(pdf.pages)
+        for number, page in enumerate(pdf.pages, start=1):
+            if prefilter:
+                candidate, page_wall, page_cpu = _timed_may_have_fees(page)
+                wall, cpu = wall + page_wall, cpu + page_cpu
+                if not candidate:
+                    skipped += 1
+                    page.close()
+                    yield number, ""
+                    continue
+            if template is not None:
+                text = "\n".join(iter_layout_lines(page, template))
+            else:
+                text = page.extract_text() or ""
+            page.close()
+            yield number, text
+    if prefilter:
+        _record_prefilter(skipped, total, wall, cpu)
+
+
+def _record_prefilter(skipped: int, total: int, wall: float, cpu: float) -> None:
+    """Log the pages the prefilter skipped and add them to the ``prefilter`` stage when tracing."""
+    logger.info("prefilter skipped %d of %d page(s) without fee keywords", skipped, total)
+    tracer = current_tracer()
+    if tracer is not None:
+        tracer.add('prefilter', wall, cpu, skipped)
+
+
+def _fast_text_is_broken(text: str) -> bool:
+    """Heuristic: does PyPDF2's text need a pdfplumber re-extraction?
+
+    Empty pages, unmapped glyphs (``(cid:NN)`` / U+FFFD), mostly non-printable
+    output, text without any amount/percent the detector could use, or a
+    table drawn column by column: PyPDF2 keeps content-stream order, so the
+    descriptions and the amounts end up on separate lines. That shows as a
+    fee line without an amount next to lines that are only an amount.
+    Lines whose only fee keywords are :data:`_HEADER_KEYWORDS` are page
+    headers, not fee rows, and are left out.
+    """
+    if not text.strip():
+        return True
+    if '(cid:' in text or '\ufffd' in text:
+        return True
+    printable = sum(1 for ch in text if ch.isprintable() or ch.isspace())
+    if printable < 0.95 * len(text):
+        return True
+    if not (AMOUNT_RE.search(text) or PERCENT_RE.search(text)):
+        return True
+    bare_fee = amount_only = False
+    for line in text.splitlines():
+        line = line.strip()
+        if AMOUNT_RE.fullmatch(line) or PERCENT_RE.fullmatch(line):
+            amount_only = True
+        elif _ROW_FEE_RE.search(line.lower()) and not (AMOUNT_RE.search(line) or PERCENT_RE.search(line)):
+            bare_fee = True
+        if bare_fee and amount_only:
+            return True
+    return False
+
+
+def iter_pages_tiered(uploaded_file, prefilter: bool = False) -> Iterator[Tuple[int, str, str]]:
+    """Yield ``(page_number, text, backend)`` trying the cheap backend first.
+
+    Pages are read with PyPDF2 and only re-extracted with pdfplumber's layout
+    analysis when :func:`_fast_text_is_broken` says so. ``backend`` is
+    ``'pypdf2'``, ``'pdfplumber'`` or ``'text'`` for non-PDF input.
+
+    With ``prefilter``, pages due for re-extraction that
+    :func:`page_may_have_fees` rules out are yielded with empty text and
+    backend ``'skipped'``, and counted as in :func:`iter_pages`.
+    """
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        from PyPDF2 import PdfReader
+
+    kind = detect_format(uploaded_file)
+    if kind != 'pdf':
+        yield 1, _read_non_pdf(uploaded_file, kind), 'text'
+        return
+
+    try:
+        uploaded_file.seek(0)
+        data = uploaded_file.read()
+        reader = PdfReader(io.BytesIO(data))
+        fast_pages = reader.pages
+    except Exception:
+        yield 1, _read_as_text(uploaded_file), 'text'
+        return
+
+    plumber = None
+    skipped, wall, cpu = 0, 0.0, 0.0
+    try:
+        for index, page in enumerate(fast_pages):
+            try:
+                text = page.extract_text() or ""
+            except Exception:
+                text = ""
+            if not _fast_text_is_broken(text):
+                yield index + 1, text, 'pypdf2'
+                continue
+            if plumber is None:
+                plumber = pdfplumber.open(io.BytesIO(data))
+            slow = plumber.pages[index]
+            if prefilter:
+                candidate, page_wall, page_cpu = _timed_may_have_fees(slow)
+                wall, cpu = wall + page_wall, cpu + page_cpu
+                if not candidate:
+                    skipped += 1
+                    slow.close()
+                    yield index + 1, "", 'skipped'
+                    continue
+            text = slow.extract_text() or ""
+            slow.close()
+            yield index + 1, text, 'pdfplumber'
+    finally:
+        if plumber is not None:
+            plumber.close()
+    if prefilter:
+        _record_prefilter(skipped, len(fast_pages), wall, cpu)
+
+
+@traced('detect_pages')
+def detect_fees_in_pdf(uploaded_file, tiered: bool = False, prefilter: bool = False,
+                       layouts: Optional[LayoutStore] = None) -> List[Dict[str, Any]]:
+    """Fee candidates of a PDF with their ``page`` and ``line_no``, one page in memory at a time.
+
+    ``prefilter`` skips layout extraction on fee-free pages, ``tiered`` or
+    not, and ``layouts`` reads known bank layouts column by column (see
+    :func:`iter_pages`).
+    """
+    if tiered:
+        pages = ((number, text) for number, text, _ in iter_pages_tiered(uploaded_file, prefilter=prefilter))
+    else:
+        pages = iter_pages(uploaded_file, prefilter=prefilter, layouts=layouts)
+    return list(detect_fees_iter(pages))
+
+
+def _open_source(source: PdfSource):
+    if isinstance(source, bytes):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(source)
+
+
+def _extract_page_range(source: PdfSource, start: int, stop: int,
+                        prefilter: bool = False) -> Tuple[List[str], int, float, float]:
+    """Worker: open the PDF independently and extract pages ``[start, stop)``.
+
+    Returns the texts with the number of pages the prefilter skipped and
+    the wall/CPU seconds it took, for the caller's tracer.
+    """
+    texts, skipped, wall, cpu = [], 0, 0.0, 0.0
+    with _open_source(source) as pdf:
+        for page in pdf.pages[start:stop]:
+            if prefilter:
+                candidate, page_wall, page_cpu = _timed_may_have_fees(page)
+                wall, cpu = wall + page_wall, cpu + page_cpu
+                if not candidate:
+                    skipped += 1
+                    texts.append("")
+                    page.close()
+                    continue
+            texts.append(page.extract_text() or "")
+            page.close()
+    return texts, skipped, wall, cpu
+
+
+# The PDF a pool worker extracts from, set once per process by _share_source.
+_shared_source: Optional[PdfSource] = None
+
+
+def _share_source(source: PdfSource) -> None:
+    global _shared_source
+    _shared_source = source
+
+
+def _extract_shared_range(start: int, stop: int, prefilter: bool = False) -> Tuple[List[str], int, float, float]:
+    return _extract_page_range(_shared_source, start, stop, prefilter)
+
+
+def extract_pages_parallel(source: PdfSource, workers: Optional[int] = None,
+                           min_pages: int = PARALLEL_MIN_PAGES, prefilter: bool = False) -> List[str]:
+    """Extract page texts across a process pool, returned in page order.
+
+    ``source`` is a path or the raw PDF bytes; it is sent to each worker
+    once, when the worker starts, and each task opens it to extract a
+    contiguous page range. ``workers`` defaults to the CPU count.
+    Documents shorter than ``min_pages`` (or a single worker) run serially.
+    Pages skipped by ``prefilter`` are logged and traced as in :func:`iter_pages`.
+    """
+    with _open_source(source) as pdf:
+        n_pages = len(pdf.pages)
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, n_pages)
+    if workers <= 1 or n_pages < min_pages:
+        chunks = [_extract_page_range(source, 0, n_pages, prefilter)]
+    else:
+        # two ranges per worker evens out pages that are slower to lay out
+        step = -(-n_pages // (workers * 2))
+        starts = list(range(0, n_pages, step))
+        stops = [min(s + step, n_pages) for s in starts]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_share_source, initargs=(source,)) as pool:
+            chunks = list(pool.map(_extract_shared_range, starts, stops, [prefilter] * len(starts)))
+    if prefilter:
+        _record_prefilter(sum(c[1] for c in chunks), n_pages, sum(c[2] for c in chunks), sum(c[3] for c in chunks))
+    return [text for texts, *_ in chunks for text in texts]
+
+
+@traced('extract', count=count_lines)
+def extract_text_from_pdf_or_text(uploaded_file, workers: Optional[int] = 1, tiered: bool = False,
+                                  prefilter: bool = False, layouts: Optional[LayoutStore] = None) -> str:
     """Accepts an uploaded file-like object from Streamlit and returns extracted text.
 
-    Falls back to reading as plain text if PDF parsing fails.
+    Falls back to reading as plain text if PDF parsing fails. With ``workers``
+    other than 1, large PDFs are extracted by :func:`extract_pages_parallel`
+    (``None`` uses every CPU). ``tiered=True`` uses :func:`iter_pages_tiered`.
+    ``prefilter=True`` leaves out pages without fee keywords (with or
+    without ``tiered``) and
+    ``layouts`` reads known bank layouts by column, serially (see :func:`iter_pages`).
     """
-    # Try PDF first
+    if tiered:
+        return "\n".join(text for _, text, _ in iter_pages_tiered(uploaded_file, prefilter=prefilter))
+    kind = detect_format(uploaded_file)
+    if workers == 1 or kind != 'pdf' or layouts is not None:
+        return "\n".join(text for _, text in iter_pages(uploaded_file, prefilter=prefilter, layouts=layouts))
+
     try:
         uploaded_file.seek(0)
-        with pdfplumber.open(uploaded_file) as pdf:
-            pages = [p.extract_text() or "" for p in pdf.pages]
-        return "\n".join(pages)
+        data = uploaded_file.read()
+        return "\n".join(extract_pages_parallel(data, workers=workers, prefilter=prefilter))
     except Exception:
-        # Try to read as text
-        try:
-            uploaded_file.seek(0)
-            data = uploaded_file.read()
-            if isinstance(data, bytes):
-                return data.decode('utf-8', errors='replace')
-            return data
-        except Exception:
-            return ""
+        return _read_as_text(uploaded_file)
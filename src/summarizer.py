@@ -1,46 +1,126 @@
+import asyncio
+from functools import cached_property
 from typing import Optional
 import pandas as pd
 
+from src.fee_batch import FeeBatch
+from src.fee_prompt import (DEFAULT_TOKEN_BUDGET, build_fee_prompts, build_merge_prompt, build_reduce_prompt,
+                            estimate_tokens, pack)
+from src.llm import DEFAULT_TIMEOUT, LLMClient, OpenAIClient, ResponseCache, complete_cached
+from src.tracing import traced
 
-def render_fee_nutrition_label(df: pd.DataFrame) -> str:
-    """Render a small markdown 'nutrition label' for detected fees.
+MIN_NOTE_TOKENS = 64
+# Costliest fees selected once per report; the label, email and chart show at most this many.
+TOP_FEES = 5
 
-    The function tolerates missing `annual_cost_estimate` column and returns
-    readable markdown for use in the Streamlit UI.
+
+class FeeReport:
+    """Derived views of one statement's annualized fees, each computed once.
+
+    Wraps a fee DataFrame or :class:`FeeBatch`. The total, transparency
+    score, top fees, category sums and the rendered label are computed on
+    first use and kept, so the metrics, chart, label, email and exports of
+    one analysis share them. Treat ``df`` as read-only.
     """
-    total_hidden = int(df['annual_cost_estimate'].dropna().sum()) if 'annual_cost_estimate' in df.columns else 0
-    count = len(df)
-    score = 100 - min(80, int(total_hidden / 20))
 
-    md = f"**Transparency Score:** **{score}%**  \n\n"
-    md += f"**Total Annual Hidden Cost (estimate):** **₹{total_hidden}**  \n\n"
-    md += f"**Detected fee lines:** {count}  \n\n"
+    def __init__(self, fees):
+        self.df = fees.to_frame() if isinstance(fees, FeeBatch) else fees
+
+    @cached_property
+    def priced(self) -> pd.Series:
+        """Annual cost estimates that could be priced (NaN dropped)."""
+        if 'annual_cost_estimate' not in self.df.columns:
+            return pd.Series(dtype=float)
+        return self.df['annual_cost_estimate'].dropna()
+
+    @property
+    def count(self) -> int:
+        return len(self.df)
+
+    @cached_property
+    def total(self) -> int:
+        return int(self.priced.sum())
+
+    @cached_property
+    def score(self) -> int:
+        """Transparency score: 100% minus 1 point per ₹20 of annual fees, floored at 20%."""
+        return 100 - min(80, int(self.total / 20))
+
+    @property
+    def average(self) -> int:
+        return int(self.total / self.count) if self.count else 0
+
+    @cached_property
+    def _top(self) -> pd.DataFrame:
+        return self.df.loc[self.priced.nlargest(TOP_FEES).index]
+
+    def top(self, k: int) -> pd.DataFrame:
+        """The ``k`` costliest priced fees, costliest first.
 
-    if 'annual_cost_estimate' in df.columns:
-        top = df.dropna(subset=['annual_cost_estimate']).sort_values('annual_cost_estimate', ascending=False).head(3)
-        if not top.empty:
-            md += "**Top hidden fees (annual est.):**  \n"
-            for _, r in top.iterrows():
-                md += f"- {r['line']} — ₹{int(r['annual_cost_estimate'])}  \n"
+        The :data:`TOP_FEES` costliest are selected once (``nlargest``) and
+        any ``k`` up to that is a slice of them; a larger ``k`` is selected
+        on each call.
+        """
+        if k > TOP_FEES:
+            return self.df.loc[self.priced.nlargest(k).index]
+        return self._top.head(k)
 
+    @cached_property
+    def category_totals(self) -> pd.Series:
+        """Annual cost per category, largest first."""
+        if 'category' not in self.df.columns:
+            return pd.Series(dtype=float)
+        sums = self.priced.groupby(self.df['category'], observed=True).sum()
+        return sums.sort_values(ascending=False)
+
+    @cached_property
+    def label(self) -> str:
+        return _render_label(self)
+
+
+def as_report(source) -> FeeReport:
+    return source if isinstance(source, FeeReport) else FeeReport(source)
+
+
+def _render_label(report: FeeReport) -> str:
+    md = f"**Transparency Score:** **{report.score}%**  \n\n"
+    md += f"**Total Annual Hidden Cost (estimate):** **₹{report.total}**  \n\n"
+    md += f"**Detected fee lines:** {report.count}  \n\n"
+
+    top = report.top(3)
+    if not top.empty:
+        md += "**Top hidden fees (annual est.):**  \n"
+        for _, r in top.iterrows():
+            md += f"- {r['line']} — ₹{int(r['annual_cost_estimate'])}  \n"
     return md
 
 
-def draft_complaint_email(df: pd.DataFrame, recipient_name: Optional[str] = 'Support') -> str:
+@traced('render_label', count=None)
+def render_fee_nutrition_label(df) -> str:
+    """Render a small markdown 'nutrition label' for detected fees.
+
+    The function tolerates missing `annual_cost_estimate` column and returns
+    readable markdown for use in the Streamlit UI. Accepts a DataFrame, a
+    :class:`FeeBatch` or a :class:`FeeReport` (rendered once per report).
+    """
+    return as_report(df).label
+
+
+@traced('draft_email', count=None)
+def draft_complaint_email(df, recipient_name: Optional[str] = 'Support') -> str:
     """Create a friendly complaint email body from the detected fees DataFrame.
 
     This is defensive: it will not raise if `annual_cost_estimate` is missing and will
-    fall back to listing detected lines.
+    fall back to listing detected lines. Accepts a DataFrame, a :class:`FeeBatch`
+    or a :class:`FeeReport`.
     """
-    if 'annual_cost_estimate' in df.columns:
-        top = df.dropna(subset=['annual_cost_estimate']).sort_values('annual_cost_estimate', ascending=False).head(5)
-    else:
-        top = pd.DataFrame()
+    report = as_report(df)
+    top = report.top(5)
 
     if not top.empty:
         fee_lines = '\n'.join([f"- {r['line']} (est. ₹{int(r['annual_cost_estimate'])})" for _, r in top.iterrows()])
     else:
-        fee_lines = '\n'.join(df['line'].tolist()[:5]) if 'line' in df.columns else 'No fee lines detected.'
+        fee_lines = '\n'.join(report.df['line'].tolist()[:5]) if 'line' in report.df.columns else 'No fee lines detected.'
 
     email = (
         f"Dear {recipient_name},\n\n"
@@ -55,22 +135,82 @@ def draft_complaint_email(df: pd.DataFrame, recipient_name: Optional[str] = 'Sup
     return email
 
 
-def llm_summary(text: str, openai_api_key: str = None) -> str:
-    """Optional LLM-based summary using OpenAI API if API key provided.
+def _llm_prompt(text: str, token_budget: int) -> str:
+    prompt = (
+        "You are a helpful assistant that summarizes detected fees from a bank statement.\n"
+        "Given the extracted text, list top hidden fees and give a one-paragraph recommendation.\n\n"
+    )
+    return prompt + text[:max(0, token_budget - estimate_tokens(prompt)) * 4]
+
+
+def _fallback_summary(source) -> str:
+    if isinstance(source, str):
+        return (source[:300] + '...') if len(source) > 300 else source
+    return render_fee_nutrition_label(source)
+
+
+async def _summarize_fees(client: LLMClient, df: pd.DataFrame, cache: Optional[ResponseCache],
+                          token_budget: int, max_tokens: int = 300) -> str:
+    """Map-reduce summary of a fee DataFrame, every prompt within ``token_budget``."""
+    prompts = build_fee_prompts(df, token_budget)
+    if len(prompts) == 1:
+        return await complete_cached(client, prompts[0], max_tokens, cache, timeout=None)
+
+    # Size the notes so that, together, they fit in the final prompt.
+    room = token_budget - estimate_tokens(build_reduce_prompt(df, []))
+    note_tokens = max(MIN_NOTE_TOKENS, min(max_tokens, room // len(prompts)))
 
-    Falls back to an extractive snippet if the OpenAI client isn't available or the
-    call fails. This function is intentionally minimal for an MVP.
+    async def complete_all(batch):
+        return list(await asyncio.gather(*(complete_cached(client, p, note_tokens, cache, timeout=None) for p in batch)))
+
+    notes = await complete_all(prompts)
+    while len(notes) > 1 and estimate_tokens(build_reduce_prompt(df, notes)) > token_budget:
+        groups = pack(notes, token_budget - estimate_tokens(build_merge_prompt([])))
+        if len(groups) == len(notes):
+            break  # notes too long to merge pairwise; send them as they are
+        notes = await complete_all([build_merge_prompt(group) for group in groups])
+    return await complete_cached(client, build_reduce_prompt(df, notes), max_tokens, cache, timeout=None)
+
+
+async def llm_summary_async(source, openai_api_key: str = None, client: Optional[LLMClient] = None,
+                            cache: Optional[ResponseCache] = None, timeout: float = DEFAULT_TIMEOUT,
+                            token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Async :func:`llm_summary`; gives up after ``timeout`` seconds.
+
+    Uses ``client`` if given, else an :class:`OpenAIClient` for ``openai_api_key``.
+    Identical prompts are answered from ``cache``. Cancelling the awaiting
+    task cancels the request.
     """
     try:
-        if not openai_api_key:
-            raise RuntimeError('No OpenAI key')
-        import openai
-        openai.api_key = openai_api_key
-        prompt = (
-            "You are a helpful assistant that summarizes detected fees from a bank statement.\n"
-            "Given the extracted text, list top hidden fees and give a one-paragraph recommendation.\n\n" + text
-        )
-        resp = openai.ChatCompletion.create(model='gpt-3.5-turbo', messages=[{"role": "user", "content": prompt}], max_tokens=300)
-        return resp['choices'][0]['message']['content'].strip()
+        if client is None:
+            if not openai_api_key:
+                raise RuntimeError('No OpenAI key')
+            client = OpenAIClient(openai_api_key, timeout=timeout)
+        if isinstance(source, str):
+            return await complete_cached(client, _llm_prompt(source, token_budget), max_tokens=300,
+                                         cache=cache, timeout=timeout)
+        df = as_report(source).df
+        return await asyncio.wait_for(_summarize_fees(client, df, cache, token_budget), timeout)
+    except asyncio.CancelledError:
+        raise
     except Exception:
-        return (text[:300] + '...') if len(text) > 300 else text
\ No newline at end of file
+        return _fallback_summary(source)
+
+
+def llm_summary(source, openai_api_key: str = None, client: Optional[LLMClient] = None,
+                cache: Optional[ResponseCache] = None, timeout: float = DEFAULT_TIMEOUT,
+                token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Optional LLM-based summary using OpenAI API if API key provided.
+
+    ``source`` is the annualized fees (DataFrame or :class:`FeeBatch`), which
+    are sent as a compact digest (see src/fee_prompt.py), or raw statement
+    text, which is cut to ``token_budget``. Falls back to the fee label (or a
+    text snippet) if the OpenAI client isn't available, the call fails or it
+    takes longer than ``timeout`` seconds.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(llm_summary_async(source, openai_api_key, client=client, cache=cache,
+                                             timeout=timeout, token_budget=token_budget))
+    return _fallback_summary(source)  # inside an event loop: await llm_summary_async instead
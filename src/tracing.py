@@ -0,0 +1,101 @@
+"""Lightweight per-stage timing for the extraction -> detection -> annualization pipeline.
+
+Pipeline functions are wrapped with :func:`traced`. Nothing is recorded
+unless a run is inside :func:`tracing`; when tracing is off the wrapper
+costs a single context-variable lookup per call.
+
+    with tracing(profile_path='run.prof') as tracer:
+        text = extract_text_from_pdf_or_text(f)
+        ...
+    print(tracer.totals())
+
+The ``.prof`` file can be opened with ``snakeviz`` or turned into a
+flamegraph with ``flameprof``.
+"""
+import cProfile
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_ACTIVE: ContextVar[Optional["Tracer"]] = ContextVar("finfeex_tracer", default=None)
+
+
+class Tracer:
+    """Collects one record per traced call: stage name, wall/CPU seconds, item count."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, name: str, wall: float, cpu: float, items: Optional[int] = None) -> None:
+        self.records.append({'stage': name, 'wall': wall, 'cpu': cpu, 'items': items})
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        """Merge records collected elsewhere, e.g. in a worker process."""
+        self.records.extend(records)
+
+    def totals(self) -> List[Dict[str, Any]]:
+        """Per-stage sums (calls, wall, cpu, items) in first-seen order."""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for r in self.records:
+            t = totals.setdefault(r['stage'], {'stage': r['stage'], 'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'items': 0})
+            t['calls'] += 1
+            t['wall'] += r['wall']
+            t['cpu'] += r['cpu']
+            t['items'] += r['items'] or 0
+        return list(totals.values())
+
+
+@contextmanager
+def tracing(profile_path: Optional[str] = None) -> Iterator[Tracer]:
+    """Trace every :func:`traced` call made inside the block.
+
+    With ``profile_path`` the block also runs under cProfile and the stats
+    are dumped there when it exits.
+    """
+    tracer = Tracer()
+    token = _ACTIVE.set(tracer)
+    profiler = cProfile.Profile() if profile_path else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield tracer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        _ACTIVE.reset(token)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _ACTIVE.get()
+
+
+def traced(name: str, count: Optional[Callable[[Any], int]] = len):
+    """Decorator recording ``name``'s timings, counting items with ``count(result)``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _ACTIVE.get()
+            if tracer is None:
+                return fn(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.process_time()
+            result = fn(*args, **kwargs)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            tracer.add(name, wall, cpu, count(result) if count is not None else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def format_totals(totals: List[Dict[str, Any]]) -> str:
+    """Render :meth:`Tracer.totals` as a fixed-width text table."""
+    lines = [f"{'stage':<14}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'items':>10}"]
+    for t in totals:
+        lines.append(f"{t['stage']:<14}{t['calls']:>7}{t['wall']:>10.4f}{t['cpu']:>10.4f}{t['items']:>10}")
+    return "\n".join(lines)
+
+
+def count_lines(text: str) -> int:
+    return text.count('\n') + 1 if text else 0
@@ -0,0 +1,25 @@
+from benchmarks.run import compare, run_suite
+from benchmarks.synthetic import generate_lines, statement_pdf
+from src.fee_detector import detect_fees_in_lines
+
+
+def test_synthetic_statements_are_seeded():
+    assert generate_lines(200, seed=7) == generate_lines(200, seed=7)
+    assert generate_lines(200, seed=7) != generate_lines(200, seed=8)
+    assert statement_pdf(60, seed=1).startswith(b"%PDF")
+
+
+def test_synthetic_fee_ratio_is_detectable():
+    fees = detect_fees_in_lines(generate_lines(2000, seed=3, fee_ratio=0.1))
+    assert 150 < len(fees) < 250
+
+
+def test_suite_reports_every_stage_and_flags_regressions():
+    results = run_suite(lines=200, pdf_lines=45, repeat=1)
+    assert set(results) == {'extract_text', 'extract_pdf', 'detect', 'annualize',
+                            'render_label', 'end_to_end_text', 'end_to_end_pdf'}
+    assert all(r['lines_per_sec'] > 0 and r['peak_mb'] >= 0 for r in results.values())
+
+    baseline = {'detect': {'seconds': 1.0}, 'annualize': {'seconds': 1.0}}
+    current = {'detect': {'seconds': 1.5}, 'annualize': {'seconds': 1.1}}
+    assert compare(current, baseline, tolerance=0.2) == [('detect', 1.5)]
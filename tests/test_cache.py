@@ -0,0 +1,104 @@
+import io
+
+import src.cache as cache_mod
+from src.cache import (
+    ResultCache,
+    content_digest,
+    extract_and_detect,
+    extract_and_detect_many,
+    file_digest,
+    result_key,
+)
+
+
+STATEMENT = "Annual fee ₹500\nFX markup 2.5%\n".encode('utf-8')
+
+
+def test_file_digest_matches_content_digest():
+    assert file_digest(io.BytesIO(STATEMENT), chunk_size=4) == content_digest(STATEMENT)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    cache.get('a')
+    cache.put('c', {'n': 3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
+    assert len(cache) == 2
+
+
+def test_disk_tier_survives_restart_and_respects_byte_cap(tmp_path):
+    cache = ResultCache(max_entries=1, cache_dir=tmp_path, max_bytes=10_000)
+    cache.put('a', {'text': 'x' * 100})
+
+    fresh = ResultCache(max_entries=1, cache_dir=tmp_path, max_bytes=10_000)
+    assert fresh.get('a') == {'text': 'x' * 100}
+
+    small = ResultCache(cache_dir=tmp_path, max_bytes=300)
+    small.put('b', {'text': 'y' * 200})
+    small.put('c', {'text': 'z' * 200})
+    assert sorted(p.stem for p in tmp_path.glob('*.json')) == ['c']
+
+
+def test_failed_disk_write_keeps_memory_entry(tmp_path, monkeypatch):
+    cache = ResultCache(cache_dir=tmp_path)
+
+    def full(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(cache_mod.os, 'replace', full)
+    cache.put('a', {'text': 'x'})
+
+    assert cache.get('a') == {'text': 'x'}
+    assert not list(tmp_path.iterdir())
+
+
+def test_identical_bytes_are_parsed_once(monkeypatch):
+    calls = []
+    real = cache_mod.parse_statement
+    monkeypatch.setattr(cache_mod, 'parse_statement',
+                        lambda data, *a: calls.append(1) or real(data, *a))
+    cache = ResultCache()
+
+    digest, text, fees = extract_and_detect(STATEMENT, cache)
+    again = extract_and_detect(bytes(STATEMENT), cache)
+
+    assert digest == content_digest(STATEMENT)
+    assert again == (digest, text, fees)
+    assert len(calls) == 1
+    assert [f['value'] for f in fees] == [500.0, 2.5]
+
+
+def test_many_uploads_yield_cached_first_then_each_once():
+    other = "Late payment penalty ₹700\n".encode('utf-8')
+    cache = ResultCache()
+    extract_and_detect(other, cache)
+    items = [(content_digest(STATEMENT), STATEMENT, 'a.txt'), (content_digest(other), other, ''),
+             (content_digest(STATEMENT), STATEMENT, 'a.txt'), ('broken', 123, 'broken.pdf')]
+
+    results = list(extract_and_detect_many(items, cache, workers=2))
+
+    assert [r[0] for r in results][0] == content_digest(other)
+    assert sorted(r[0] for r in results) == sorted({content_digest(STATEMENT), content_digest(other), 'broken'})
+    by_digest = {r[0]: r for r in results}
+    assert by_digest[content_digest(STATEMENT)][1:] == extract_and_detect(STATEMENT)[1:] + (None,)
+    assert isinstance(by_digest['broken'][3], TypeError)
+    assert cache.get(result_key(content_digest(STATEMENT), filename='a.txt')) is not None
+    assert cache.get(result_key('broken', filename='broken.pdf')) is None
+
+
+def test_entries_are_keyed_by_schema_and_options(tmp_path, monkeypatch):
+    cache = ResultCache(cache_dir=tmp_path)
+    digest = content_digest(STATEMENT)
+    # an entry from before fees carried line numbers, under the bare digest
+    cache.put(digest, {'text': '', 'fees': [{'line': 'Annual fee ₹500'}]})
+
+    _, _, fees = extract_and_detect(STATEMENT, cache)
+    assert fees[0]['line_no'] == 1
+    assert len({result_key(digest), result_key(digest, tiered=True), digest}) == 3
+
+    monkeypatch.setattr(cache_mod, 'CACHE_SCHEMA', cache_mod.CACHE_SCHEMA + 1)
+    assert ResultCache(cache_dir=tmp_path).get(result_key(digest)) is None
+    assert not list(tmp_path.glob('*.tmp'))
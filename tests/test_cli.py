@@ -0,0 +1,92 @@
+import csv
+import json
+
+from src.cli import iter_statement_paths, main
+from src.history import HistoryStore
+
+STATEMENT = "Annual fee ₹500\nGrocery store ₹250\nSMS alert ₹15 monthly\n"
+
+
+def make_statements(tmp_path, count):
+    folder = tmp_path / "statements"
+    folder.mkdir()
+    for i in range(count):
+        (folder / f"stmt_{i}.txt").write_text(STATEMENT, encoding="utf-8")
+    (folder / "notes.md").write_text("Annual fee ₹1", encoding="utf-8")
+    return folder
+
+
+def test_iter_statement_paths_expands_dirs_and_globs(tmp_path):
+    folder = make_statements(tmp_path, 2)
+    paths = list(iter_statement_paths([str(folder), str(folder / "*.txt"), str(folder / "notes.md")]))
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["stmt_0.txt", "stmt_1.txt", "notes.md"]
+
+
+def test_batch_jsonl_tags_each_fee_with_source(tmp_path):
+    folder = make_statements(tmp_path, 3)
+    out = tmp_path / "fees.jsonl"
+
+    assert main([str(folder), "-j", "2", "--max-in-flight", "1", "-o", str(out)]) == 0
+
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 6
+    assert {r["source"].rsplit("/", 1)[-1] for r in records} == {"stmt_0.txt", "stmt_1.txt", "stmt_2.txt"}
+    sms = next(r for r in records if r["line"].startswith("SMS"))
+    assert sms["annual_cost_estimate"] == 180.0 and sms["category"] == "Communication"
+
+
+def test_batch_csv_reports_missing_files(tmp_path, capsys):
+    folder = make_statements(tmp_path, 1)
+    out = tmp_path / "fees.csv"
+
+    assert main([str(folder / "stmt_0.txt"), str(folder / "missing.txt"), "-j", "1", "-f", "csv", "-o", str(out)]) == 1
+    with open(out, encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    assert [r["value"] for r in rows] == ["500.0", "15.0"]
+    assert "missing.txt" in capsys.readouterr().err
+
+
+def test_history_skips_statements_already_ingested(tmp_path):
+    folder = make_statements(tmp_path, 3)  # three files, identical content
+    (folder / "other.txt").write_text("Late payment penalty ₹700\n", encoding="utf-8")
+    db = str(tmp_path / "history.db")
+    out = tmp_path / "fees.jsonl"
+
+    assert main([str(folder), "-j", "1", "--history", db, "-o", str(out)]) == 0
+    sources = {json.loads(line)["source"].rsplit("/", 1)[-1] for line in out.read_text(encoding="utf-8").splitlines()}
+    assert sources == {"other.txt", "stmt_0.txt"}
+    assert len(HistoryStore(db)) == 2
+
+    assert main([str(folder), "--history", db, "-o", str(out)]) == 0
+    assert out.read_text(encoding="utf-8") == ""
+
+
+def test_prefilter_reports_skipped_pages(tmp_path, capsys):
+    from reportlab.pdfgen import canvas
+
+    path = tmp_path / "long.pdf"
+    c = canvas.Canvas(str(path))
+    for text in ["Grocery store 250", "Fuel station 900", "Annual fee 500"]:
+        c.drawString(50, 800, text)
+        c.showPage()
+    c.save()
+    out = tmp_path / "fees.jsonl"
+
+    assert main([str(path), "-j", "2", "--prefilter", "-o", str(out)]) == 0
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [(r["page"], r["value"]) for r in records] == [(3, 500.0)]
+    assert "skipped 2 page(s)" in capsys.readouterr().err
+
+
+def test_tiered_prefilter_reports_skipped_pages(tmp_path, capsys):
+    from reportlab.pdfgen import canvas
+
+    path = tmp_path / "short.pdf"
+    c = canvas.Canvas(str(path))
+    for text in ["Annual fee 500", "Thank you for banking with us"]:
+        c.drawString(50, 800, text)
+        c.showPage()
+    c.save()
+
+    assert main([str(path), "-j", "1", "--tiered", "--prefilter", "-o", str(tmp_path / "fees.jsonl")]) == 0
+    assert "skipped 1 page(s)" in capsys.readouterr().err
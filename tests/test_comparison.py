@@ -0,0 +1,52 @@
+from src.comparison import StatementComparison
+from src.costs import annualize_fees
+from src.fee_batch import FeeBatch
+from src.fee_detector import detect_fee_batch
+from src.history import HistoryStore
+
+
+def store_with(statements):
+    store = HistoryStore()
+    for name, text in statements:
+        store.add_statement(name, annualize_fees(detect_fee_batch(text), estimated_annual_txns=12))
+    return store
+
+
+def test_matrix_matches_per_statement_groupby():
+    texts = [
+        ('a.pdf', "Annual fee ₹500\nSMS alert ₹15 monthly\n"),
+        ('b.pdf', "FX markup 2%\nLate payment penalty ₹700\n"),
+        ('a.pdf', "ATM withdrawal charge ₹20 per txn\n"),
+    ]
+    comparison = StatementComparison.from_store(store_with(texts))
+
+    assert list(comparison.table['Statement']) == ['a.pdf (#1)', 'b.pdf', 'a.pdf (#3)']
+    for label, (_, text) in zip(comparison.table.index, texts):
+        fees = annualize_fees(detect_fee_batch(text), estimated_annual_txns=12).to_frame()
+        expected = fees.groupby('category', observed=True)['annual_cost_estimate'].sum()
+        row = comparison.matrix.loc[label]
+        assert row[row > 0].to_dict() == expected[expected > 0].to_dict()
+    # categories are ordered by their total across statements
+    assert list(comparison.matrix.sum()) == sorted(comparison.matrix.sum(), reverse=True)
+
+
+def test_rankings_savings_and_paging():
+    texts = [(f's{i}', f"Annual fee ₹{100 * (i + 1)}\n") for i in range(7)]
+    comparison = StatementComparison.from_store(store_with(texts))
+
+    assert list(comparison.best(2)['Statement']) == ['s0', 's1']
+    assert list(comparison.worst(1)['Statement']) == ['s6']
+    assert comparison.savings() == {'best': 's0', 'worst': 's6', 'amount': 600.0}
+    assert comparison.pages(3) == 3
+    assert list(comparison.page(3, 3)['Statement']) == ['s6']
+
+
+def test_statements_without_fees():
+    store = HistoryStore()
+    store.add_statement('empty', FeeBatch.from_records([]))
+    store.add_statement('also-empty', FeeBatch.from_records([]))
+    comparison = StatementComparison.from_store(store)
+
+    assert len(comparison) == 2
+    assert comparison.matrix.shape == (2, 0)
+    assert comparison.savings() is None
@@ -1,4 +1,6 @@
-from src.costs import annualize_fees
+import pandas as pd
+
+from src.costs import annualize_fee_frame, annualize_fees
 
 
 def test_annualize_amounts_and_percents():
@@ -20,3 +22,25 @@ def test_annualize_amounts_and_percents():
 
     proc = df[df['line'].str.contains('Processing')].iloc[0]
     assert int(proc['annual_cost_estimate']) == 99
+
+
+def test_annualize_fee_frame_is_columnar_equivalent():
+    detected = [
+        {'line': 'SMS alert ₹15 per month', 'type': 'amount', 'value': 15.0},
+        {'line': 'ATM charge ₹20 per txn', 'type': 'amount', 'value': 20.0},
+        {'line': 'Card renewal annual ₹500', 'type': 'amount', 'value': 500.0},
+        {'line': 'FX markup 3.5%', 'type': 'percent', 'value': 3.5},
+        {'line': 'Statement fee', 'type': 'unknown', 'value': None},
+    ]
+
+    no_txns = annualize_fees(detected)
+    assert list(no_txns['frequency']) == ['monthly', 'per_txn', 'yearly', 'unknown', 'unknown']
+    assert list(no_txns['annual_cost_estimate'].isna()) == [False, True, False, True, True]
+
+    df = annualize_fee_frame(pd.DataFrame(detected), estimated_annual_txns=10)
+    assert list(df['annual_cost_estimate'].fillna(-1)) == [180.0, 200.0, 500.0, 35.0, -1]
+    pd.testing.assert_frame_equal(df, annualize_fees(detected, estimated_annual_txns=10))
+
+
+def test_annualize_empty_input():
+    assert annualize_fees([]).empty
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from src.costs import annualize_fees
+from src.fee_batch import FeeBatch
+from src.fee_detector import detect_fee_batch, detect_fees_in_text
+from src.summarizer import draft_complaint_email, render_fee_nutrition_label
+
+TEXT = """Online payment convenience fee ₹49 monthly
+Foreign transaction markup 3.5%
+Grocery Mart ₹1,250.00
+Statement fee
+Annual credit card fee ₹499
+"""
+
+
+def test_records_round_trip_with_missing_values():
+    fees = detect_fees_in_text(TEXT)
+    batch = FeeBatch.from_records(fees)
+
+    assert len(batch) == len(fees) == 4
+    assert isinstance(batch['category'], pd.Categorical)
+    assert batch['value'].dtype == np.float64
+    # keys a candidate lacked come back as None
+    assert batch.to_records() == [{name: f.get(name) for name in batch.columns} for f in fees]
+
+
+def test_page_and_line_numbers_may_be_missing():
+    records = [{'line': 'a', 'page': 1, 'line_no': 3}, {'line': 'b'}]
+    batch = FeeBatch.from_records(records)
+
+    assert str(batch['page'].dtype) == 'Int32'
+    assert batch.to_records() == [records[0], {'line': 'b', 'page': None, 'line_no': None}]
+    assert FeeBatch.from_frame(batch.to_frame()).to_records() == batch.to_records()
+
+
+def test_to_frame_does_not_copy():
+    batch = detect_fee_batch(TEXT)
+    df = batch.to_frame()
+
+    assert np.shares_memory(df['value'].to_numpy(), batch['value'])
+    assert list(df['line']) == [f['line'] for f in detect_fees_in_text(TEXT)]
+
+
+def test_annualize_batch_keeps_detector_columns():
+    batch = detect_fee_batch(TEXT)
+    annual = annualize_fees(batch, estimated_annual_txns=12)
+
+    assert isinstance(annual, FeeBatch)
+    assert {'category', 'currency', 'frequency', 'annual_cost_estimate'} <= set(annual.columns)
+    expected = annualize_fees(detect_fees_in_text(TEXT), estimated_annual_txns=12)
+    pd.testing.assert_series_equal(annual.to_frame()['annual_cost_estimate'], expected['annual_cost_estimate'])
+    assert len(annualize_fees(FeeBatch.from_records([]))) == 0
+
+
+def test_summarizer_accepts_batch():
+    annual = annualize_fees(detect_fee_batch(TEXT), estimated_annual_txns=12)
+
+    assert render_fee_nutrition_label(annual) == render_fee_nutrition_label(annual.to_frame())
+    assert "Annual credit card fee" in draft_complaint_email(annual)
@@ -1,4 +1,15 @@
-from src.fee_detector import detect_fees_in_text
+import pandas as pd
+
+from src.fee_detector import (
+    CATEGORY_KEYWORDS,
+    FEE_KEYWORDS,
+    detect_fees_batch,
+    detect_fees_in_lines,
+    detect_fees_in_pages,
+    detect_fees_in_text,
+    detect_fees_iter,
+    match_fee_line,
+)
 
 
 def test_detect_amounts_and_percents():
@@ -11,3 +22,80 @@ def test_detect_amounts_and_percents():
     assert any(f['type'] == 'amount' and f['value'] == 49.0 for f in fees)
     assert any(f['type'] == 'percent' and f['value'] == 2.5 for f in fees)
     assert any(f['type'] == 'amount' and f['value'] == 99.0 for f in fees)
+
+
+def test_detect_fees_in_pages_streams_with_page_numbers():
+    pages = iter([
+        (1, "Opening balance ₹1,000\nAnnual fee ₹500"),
+        (2, "Grocery store ₹250"),
+        (3, "Foreign transaction markup 3.5%"),
+    ])
+    stream = detect_fees_in_pages(pages)
+
+    first = next(stream)
+    assert first['page'] == 1 and first['value'] == 500.0
+    rest = list(stream)
+    assert [(f['page'], f['type']) for f in rest] == [(3, 'percent')]
+
+
+def test_detect_fees_iter_is_lazy_and_numbers_lines():
+    def lines():
+        yield "Opening balance ₹1,000"
+        yield b"Annual fee \xe2\x82\xb9500\n"  # bytes, as read from a binary stream
+        yield "Late payment penalty ₹700"
+        raise AssertionError("read past the first two fees")
+
+    stream = detect_fees_iter(lines())
+    first, second = next(stream), next(stream)
+    assert (first['line_no'], first['page'], first['value']) == (2, 1, 500.0)
+    assert (second['line_no'], second['line']) == (3, "Late payment penalty ₹700")
+
+    pages = detect_fees_iter([(4, "Grocery ₹250\nSMS alert ₹15 monthly")])
+    assert [(f['page'], f['line_no']) for f in pages] == [(4, 2)]
+    assert [f['line_no'] for f in detect_fees_in_text("x\nAnnual fee ₹500\n\nFX markup 2%")] == [2, 4]
+
+
+def _reference_match(line):
+    l = line.lower()
+    is_fee = any(k in l for k in FEE_KEYWORDS)
+    for name, words in CATEGORY_KEYWORDS:
+        if any(k in l for k in words):
+            return is_fee, name
+    return is_fee, "Other Fees"
+
+
+def test_match_fee_line_agrees_with_substring_scan():
+    lines = [
+        "Foreign transaction fee 3.5%", "FXALERT", "servicecharge", "Currency conversion",
+        "cash withdrawals at ATM", "Grocery store ₹250", "late payments", "StatementS",
+        "transaction", "Membership renewal", "card replacement courier", "", "fee",
+        "minimum balance maintenance", "reward redemption lounge access", "interchangefuel surcharge",
+    ]
+    for line in lines:
+        assert match_fee_line(line) == _reference_match(line), line
+
+
+def test_detect_fees_batch_matches_per_line_detector():
+    lines = pd.Series([
+        "Payment convenience fee ₹49",
+        "Grocery store ₹250",
+        "Foreign transaction markup 2.5%",
+        "SMS alert service",
+        "Annual fee $1,200.50",
+        None,
+        "Late payment penalty ₹१,५००",  # non-ASCII digits
+        "FX markup ٢.٥%",
+    ], index=pd.MultiIndex.from_tuples([('jan', i) for i in range(3)] + [('feb', i) for i in range(5)]))
+
+    batch = detect_fees_batch(lines)
+    expected = detect_fees_in_lines(lines.dropna())
+
+    assert list(batch.index) == [('jan', 0), ('jan', 2), ('feb', 0), ('feb', 1), ('feb', 3), ('feb', 4)]
+    assert list(batch['value'].tail(2)) == [1500.0, 2.5]
+    for got, want in zip(batch.to_dict('records'), expected):
+        del want['line_no'], want['page']  # the batch keeps the input index instead
+        want.setdefault('currency', None)
+        if want['value'] is None:
+            assert pd.isna(got.pop('value'))
+            want.pop('value')
+        assert got == want
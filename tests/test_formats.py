@@ -0,0 +1,99 @@
+import io
+
+import src.formats as formats
+import src.pdf_parser as pdf_parser
+from src.cache import parse_statement
+from src.fee_detector import detect_fees_in_lines
+from src.formats import parse_csv, parse_ofx, register_parser, sniff_format
+from src.pdf_parser import iter_statement_lines
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>INR<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250905120000<TRNAMT>-1,250.00<NAME>Grocery Mart</STMTTRN>
+<STMTTRN><TRNTYPE>SRVCHG<DTPOSTED>20250910<TRNAMT>-49.00<NAME>Online payment<MEMO>convenience</STMTTRN>
+<STMTTRN><TRNTYPE>FEE<DTPOSTED>20250901<TRNAMT>-500.00<NAME>Card renewal</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_sniff_prefers_magic_bytes_over_extension():
+    assert sniff_format(b"%PDF-1.7\n...", "statement.txt") == "pdf"
+    assert sniff_format(OFX[:200], "export.dat") == "ofx"
+    assert sniff_format(b"anything", "Export.CSV") == "csv"
+    assert sniff_format(b"Date,Description,Amount\n01-09,Annual fee,500\n02-09,Tea,40\n") == "csv"
+    assert sniff_format(b"Account Statement - Acme Bank\n\nAnnual fee 500\n") == "txt"
+
+
+def test_parse_csv_joins_cells_per_row():
+    data = b"Date,Description,Amount\n01-Sep-2025,Annual credit card fee,500\n02-Sep-2025,Coffee,\"1,200.50\"\n"
+    assert parse_csv(data) == [
+        "Annual credit card fee 500",
+        "Coffee 1,200.50",
+    ]
+
+
+def test_parse_csv_reads_the_amount_not_the_date():
+    data = (b"Txn Date,Ref No,Narration,Debit,Credit,Balance\n"
+            b"03-09-2025,1234,Late payment penalty,350,,10000\n"
+            b"04-09-2025,1235,Fee reversal,,350,10350\n")
+    fees = detect_fees_in_lines(parse_csv(data))
+    assert [(f['line'], f['value']) for f in fees] == [("Late payment penalty 350", 350.0), ("Fee reversal", None)]
+    # the app's parse path feeds the same rows to the detector
+    assert parse_statement(data)[1] == fees
+
+    headerless_dates = b"When,What,How much\n01-Sep-2025,Annual credit card fee,500\n"
+    assert [f['value'] for f in detect_fees_in_lines(parse_csv(headerless_dates))] == [500.0]
+
+
+def test_parse_csv_keeps_the_first_row_without_a_header():
+    data = b"Annual fee, 500, 2024-01-01\nLate payment penalty, 300, 2024-02-01\n"
+    assert parse_csv(data) == ["Annual fee 500", "Late payment penalty 300"]
+    assert parse_csv(b"Annual fee,Rs 500\nLate payment penalty,Rs 300\n") == [
+        "Annual fee Rs 500", "Late payment penalty Rs 300"]
+    assert parse_csv(b"Annual fee 500\n") == ["Annual fee 500"]
+    assert parse_csv(b"Card renewal fee,INR 500\nSMS alerts,INR 15\n") == ["Card renewal fee INR 500", "SMS alerts INR 15"]
+    assert parse_csv(b"Annual fee,waived\nLate payment penalty,waived\n") == [
+        "Annual fee waived", "Late payment penalty waived"]
+    assert parse_csv(b"Particulars,Fees\nAnnual,500\n") == ["Annual 500"]
+
+
+def test_text_statement_is_read_by_its_extension():
+    data = b"Annual fee, 500 due\nLate payment penalty, 300 due\n"
+    assert sniff_format(data) == "csv"
+    text, fees = parse_statement(data, filename="statement.txt")
+    assert text.splitlines() == data.decode().splitlines()
+    assert [f['value'] for f in fees] == [500.0, 300.0]
+
+
+def test_parse_ofx_rows_feed_the_detector():
+    lines = parse_ofx(OFX)
+    assert lines[0] == "Grocery Mart 1,250.00 20250905"
+    fees = detect_fees_in_lines(lines)
+    assert [(f['line'], f['value']) for f in fees] == [
+        ("Online payment convenience (service charge) 49.00 20250910", 49.0),
+        ("Card renewal (fee) 500.00 20250901", 500.0),
+    ]
+
+
+def test_text_upload_never_touches_pdfplumber(monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("pdfplumber.open called for a text upload")
+    monkeypatch.setattr(pdf_parser.pdfplumber, 'open', boom)
+
+    upload = io.BytesIO(b"Processing fee 99\nLate payment penalty 350\n")
+    assert list(iter_statement_lines(upload)) == ["Processing fee 99", "Late payment penalty 350"]
+
+
+def test_register_parser_plugs_in_new_format(monkeypatch):
+    monkeypatch.setattr(formats, 'PARSERS', dict(formats.PARSERS))
+    monkeypatch.setattr(formats, 'SNIFFERS', list(formats.SNIFFERS))
+    monkeypatch.setattr(formats, 'EXTENSIONS', dict(formats.EXTENSIONS))
+    monkeypatch.setattr(pdf_parser, 'PARSERS', formats.PARSERS)
+
+    register_parser('tsv', lambda data: [r.replace(b'\t', b' ').decode() for r in data.splitlines()],
+                    extensions=['.tsv'])
+    upload = io.BytesIO(b"SMS alert\t15\n")
+    upload.name = "alerts.tsv"
+    assert list(iter_statement_lines(upload)) == ["SMS alert 15"]
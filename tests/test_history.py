@@ -0,0 +1,83 @@
+import math
+
+from src.costs import annualize_fees
+from src.fee_detector import detect_fee_batch
+from src.history import HistoryStore, session_history, statement_aggregates
+
+TEXT = """Online payment convenience fee ₹49 monthly
+Annual credit card fee ₹499
+SMS alert service ₹15 monthly
+Statement fee
+"""
+
+
+def batch():
+    return annualize_fees(detect_fee_batch(TEXT), estimated_annual_txns=12)
+
+
+def test_aggregates_skip_unpriced_fees():
+    agg = statement_aggregates(batch())
+
+    assert agg['count'] == 4
+    assert agg['priced'] == 3
+    assert agg['total'] == 49 * 12 + 499 + 15 * 12
+    assert math.isclose(agg['mean'], agg['total'] / 3)
+    assert sum(total for total, _ in agg['categories'].values()) == agg['total']
+
+
+def test_store_serves_aggregates_and_persists(tmp_path):
+    path = str(tmp_path / 'history.db')
+    store = HistoryStore(path)
+    store.add_statement('jan.txt', batch(), date='2025-01-31')
+    store.add_statement('feb.txt', batch(), date='2025-02-28')
+    store.close()
+
+    store = HistoryStore(path)
+    overall = store.overall()
+    assert overall['statements'] == len(store) == 2
+    assert overall['total'] == 2 * statement_aggregates(batch())['total']
+    assert overall['count'] == 8
+    assert list(store.summaries()['name']) == ['jan.txt', 'feb.txt']
+    assert store.category_totals()['total'].sum() == overall['total']
+    assert len(store.fees(limit=5)) == 5
+    assert list(store.fees()['statement'][:4]) == ['feb.txt'] * 4
+
+    store.clear()
+    assert store.overall()['total'] == 0
+    assert store.fees().empty and store.statement_categories().empty
+
+
+def test_session_history_defaults_to_memory(monkeypatch):
+    monkeypatch.delenv('FINFEEX_HISTORY_DB', raising=False)
+    state = {}
+    store = session_history(state)
+
+    assert store.path == ':memory:'
+    assert session_history(state) is store
+
+
+def test_same_content_is_stored_once_whatever_its_name():
+    store = HistoryStore()
+    first = store.add_statement('statement.pdf', batch(), digest='aaa')
+    assert store.add_statement('renamed.pdf', batch(), digest='aaa') == first
+    other = store.add_statement('statement.pdf', batch(), digest='bbb')
+
+    assert other != first and len(store) == 2
+    assert store.find('aaa') == first and 'bbb' in store and 'ccc' not in store
+    store.clear()
+    assert 'aaa' not in store
+
+
+def test_digest_index_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'history.db')
+    one, two = HistoryStore(path), HistoryStore(path)
+    sid = one.add_statement('a.pdf', batch(), digest='aaa')
+
+    assert two.find('aaa') == sid
+    assert two.add_statement('b.pdf', batch(), digest='aaa') == sid
+    assert len(HistoryStore(path)) == 1
+
+    one.clear()
+    assert two.find('aaa') is None
+    again = two.add_statement('b.pdf', batch(), digest='aaa')
+    assert len(one) == 1 and one.find('aaa') == again
@@ -0,0 +1,90 @@
+import io
+import pickle
+
+import pdfplumber
+from reportlab.pdfgen import canvas
+
+from src.layouts import LayoutStore, fingerprint, learn_layout
+from src.pdf_parser import detect_fees_in_pdf
+
+ROWS = [
+    ("Annual credit card fee", "500", "01-Sep-2025"),
+    ("Grocery Mart", "1,250.00", "03-Sep-2025"),
+    ("Card replacement fee", "", "07-Sep-2025"),
+    ("Late payment penalty", "350", "28-Sep-2025"),
+]
+
+
+def make_statement(top=800, header=True):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(50, top, "Account Statement - Acme Bank")
+    y = top - 40
+    if header:
+        c.drawString(50, y, "Description")
+        c.drawString(330, y, "Amount")
+        c.drawString(430, y, "Date")
+    for description, amount, date in ROWS:
+        y -= 14
+        c.drawString(50, y, description)
+        c.drawRightString(380, y, amount)
+        c.drawString(430, y, date)
+    c.showPage()
+    c.save()
+    buf.seek(0)
+    return buf
+
+
+def test_learn_layout_splits_columns_at_the_gutters():
+    with pdfplumber.open(make_statement()) as pdf:
+        template = learn_layout(pdf.pages[0])
+
+    assert template['labels'] == {'description': 'description', 'amount': 'amount'}
+    (d0, _, d1, _), (a0, _, a1, _) = template['columns']['description'], template['columns']['amount']
+    assert d0 < 50 and d1 == a0 and 200 < a0 < 330 and 380 < a1 < 430
+
+
+def test_known_layout_reads_description_and_amount_only(tmp_path):
+    store = LayoutStore(str(tmp_path / "layouts.json"))
+    whole = detect_fees_in_pdf(make_statement())
+    fees = detect_fees_in_pdf(make_statement(), layouts=store)
+
+    # The date column no longer leaks into lines with no amount
+    assert next(f for f in whole if f['line'].startswith('Card'))['value'] == 7.0
+    assert [(f['line'], f['value']) for f in fees] == [
+        ("Annual credit card fee 500", 500.0),
+        ("Card replacement fee", None),
+        ("Late payment penalty 350", 350.0),
+    ]
+
+    # Reused from the file for a statement whose table sits lower on the page
+    reopened = pickle.loads(pickle.dumps(store))
+    assert len(reopened) == 1
+    assert detect_fees_in_pdf(make_statement(top=700), layouts=reopened) == fees
+
+
+def test_layout_without_header_is_remembered_as_none():
+    store = LayoutStore()
+    statement = make_statement(header=False)
+    with pdfplumber.open(statement) as pdf:
+        key = fingerprint(pdf)
+        assert store.template_for(pdf) is None
+
+    assert key in store and store.get(key) is None
+    assert detect_fees_in_pdf(statement, layouts=store) == detect_fees_in_pdf(statement)
+
+
+def test_stores_sharing_a_file_merge_their_layouts(tmp_path):
+    path = str(tmp_path / "layouts.json")
+    first, second = LayoutStore(path), LayoutStore(path)
+    first.put('bank-a', {'labels': {}, 'columns': {}})
+    second.put('bank-b', None)
+
+    reopened = LayoutStore(path)
+    assert 'bank-a' in reopened and 'bank-b' in reopened
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["layouts.json", "layouts.json.lock"]
+
+    # a store that cannot be written still keeps what it learned
+    broken = LayoutStore(str(tmp_path))
+    broken.put('bank-c', None)
+    assert 'bank-c' in broken
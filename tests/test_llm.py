@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from src.costs import annualize_fees
+from src.fee_batch import FeeBatch
+from src.fee_prompt import DEFAULT_TOKEN_BUDGET, REDUCE_INSTRUCTIONS, build_fee_prompts, estimate_tokens
+from src.llm import ResponseCache, complete_cached
+from src.summarizer import llm_summary, llm_summary_async, render_fee_nutrition_label
+
+
+class FakeClient:
+    model = 'fake'
+
+    def __init__(self, reply='Cut the FX markup.', delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.prompts = []
+
+    async def complete(self, prompt, max_tokens=300):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return self.reply
+
+
+def test_same_prompt_is_answered_from_cache():
+    client, cache = FakeClient(), ResponseCache()
+
+    assert llm_summary('Annual fee ₹500', client=client, cache=cache) == 'Cut the FX markup.'
+    assert llm_summary('Annual fee ₹500', client=client, cache=cache) == 'Cut the FX markup.'
+    assert len(client.prompts) == 1
+    llm_summary('FX markup 3.5%', client=client, cache=cache)
+    assert len(client.prompts) == 2
+
+
+def test_cache_expires_and_evicts():
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    cache.get('a')
+    cache.put('c', 'C')
+    assert cache.get('b') is None and cache.get('a') == 'A'
+
+    now[0] = 11
+    assert cache.get('a') is None and len(cache) == 1
+
+
+def test_slow_upstream_times_out_to_fallback():
+    client, cache = FakeClient(delay=5), ResponseCache()
+    start = time.perf_counter()
+
+    assert llm_summary('Annual fee ₹500', client=client, cache=cache, timeout=0.05) == 'Annual fee ₹500'
+    assert time.perf_counter() - start < 1
+    assert len(cache) == 0
+
+
+def test_async_call_can_be_cancelled():
+    async def run():
+        task = asyncio.create_task(complete_cached(FakeClient(delay=5), 'prompt'))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    assert asyncio.run(llm_summary_async('x', client=FakeClient('ok'))) == 'ok'
+
+
+def test_without_key_or_client_falls_back_to_snippet():
+    assert llm_summary('x' * 400) == 'x' * 300 + '...'
+
+
+def fee_frame(n):
+    return annualize_fees(FeeBatch.from_records([
+        {'line': f'Service charge #{i} ₹{10 + i} monthly', 'type': 'amount', 'value': 10.0 + i,
+         'category': 'Account Maintenance' if i % 2 else 'Transaction Fees'}
+        for i in range(n)
+    ]), estimated_annual_txns=12).to_frame()
+
+
+def test_fees_fit_one_prompt_without_statement_text():
+    client = FakeClient()
+    df = fee_frame(5)
+
+    assert llm_summary(df, client=client) == 'Cut the FX markup.'
+    assert len(client.prompts) == 1
+    prompt = client.prompts[0]
+    assert estimate_tokens(prompt) <= DEFAULT_TOKEN_BUDGET
+    assert 'Account Maintenance' in prompt and 'estimated annual total: ₹720' in prompt
+
+
+def test_oversized_digest_is_map_reduced_within_budget():
+    client = FakeClient(reply='- note')
+    df = fee_frame(25)
+    budget = 250
+    prompts = build_fee_prompts(df, token_budget=budget)
+    assert len(prompts) > 1
+
+    assert llm_summary(df, client=client, token_budget=budget) == '- note'
+    assert len(client.prompts) == len(prompts) + 1  # map calls + one reduce
+    assert all(estimate_tokens(p) <= budget for p in client.prompts)
+    assert client.prompts[-1].startswith(REDUCE_INSTRUCTIONS)
+
+
+def test_failed_fee_summary_falls_back_to_label():
+    df = fee_frame(3)
+    assert llm_summary(df) == render_fee_nutrition_label(df)
@@ -0,0 +1,235 @@
+import io
+import logging
+import os
+import threading
+
+import pdfplumber
+from pdfminer.pdffont import PDFSimpleFont, PDFUnicodeNotDefined
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import LIT
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from src.fee_detector import detect_fees_in_text
+from src.tracing import tracing
+from src.pdf_parser import (
+    detect_fees_in_pdf,
+    detect_fees_in_text_file,
+    extract_pages_parallel,
+    extract_text_from_pdf_or_text,
+    iter_pages,
+    iter_pages_tiered,
+    iter_text_lines,
+    page_may_have_fees,
+)
+
+
+def make_pdf(pages):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for lines in pages:
+        y = 800
+        for line in lines:
+            c.drawString(50, y, line)
+            y -= 14
+        c.showPage()
+    c.save()
+    buf.seek(0)
+    return buf
+
+
+def test_iter_pages_yields_each_pdf_page_in_order():
+    pdf = make_pdf([["Annual fee 500"], ["Processing fee 99"]])
+    pages = list(iter_pages(pdf))
+    assert [n for n, _ in pages] == [1, 2]
+    assert "Annual fee 500" in pages[0][1]
+    assert "Processing fee 99" in pages[1][1]
+
+
+def test_text_upload_falls_back_to_single_page():
+    upload = io.BytesIO("Convenience fee ₹49\n".encode('utf-8'))
+    assert list(iter_pages(upload)) == [(1, "Convenience fee ₹49\n")]
+    assert extract_text_from_pdf_or_text(upload) == "Convenience fee ₹49\n"
+
+
+def test_parallel_extraction_matches_serial_order():
+    pdf = make_pdf([[f"Page {i} service charge {i * 10}"] for i in range(1, 7)])
+    data = pdf.getvalue()
+
+    parallel = extract_pages_parallel(data, workers=2, min_pages=1)
+    serial = [text for _, text in iter_pages(io.BytesIO(data))]
+    assert parallel == serial
+    assert extract_text_from_pdf_or_text(io.BytesIO(data), workers=2) == "\n".join(serial)
+
+
+def test_tiered_extraction_falls_back_per_page():
+    pdf = make_pdf([["Annual fee 500"], ["Thank you for banking with us"]])
+    pages = list(iter_pages_tiered(pdf))
+
+    assert [(n, backend) for n, _, backend in pages] == [(1, 'pypdf2'), (2, 'pdfplumber')]
+    assert "Annual fee 500" in pages[0][1]
+    assert "Thank you" in pages[1][1]
+
+
+def test_tiered_extraction_rereads_column_ordered_tables():
+    # Descriptions drawn first, then the amounts column: PyPDF2 returns them
+    # on separate lines, pdfplumber lines them up by position.
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    c.drawString(50, 800, "Statement for 01-Sep-2025 to 30-Sep-2025")
+    for y, text in [(760, "Annual fee"), (746, "Late payment penalty")]:
+        c.drawString(50, y, text)
+    for y, text in [(760, "500"), (746, "350")]:
+        c.drawRightString(400, y, text)
+    c.showPage()
+    c.save()
+    buf.seek(0)
+
+    (_, text, backend), = iter_pages_tiered(buf)
+    assert backend == 'pdfplumber'
+    fees = detect_fees_in_text(text)
+    assert [f['value'] for f in fees if 'fee' in f['line'] or 'penalty' in f['line']] == [500.0, 350.0]
+
+
+def test_tiered_extraction_rereads_a_single_column_ordered_fee_row():
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    rows = [(760, "Grocery Mart", "1,250.00"), (746, "Annual credit card fee", "500"), (732, "Fuel station", "900")]
+    for y, text, _ in rows:
+        c.drawString(50, y, text)
+    for y, _, amount in rows:
+        c.drawRightString(400, y, amount)
+    c.showPage()
+    c.save()
+    buf.seek(0)
+
+    (_, text, backend), = iter_pages_tiered(buf)
+    assert backend == 'pdfplumber'
+    assert [(f['line'], f['value']) for f in detect_fees_in_text(text)] == [("Annual credit card fee 500", 500.0)]
+
+
+def test_tiered_extraction_keeps_pages_with_a_statement_header():
+    pdf = make_pdf([["Account Statement - Acme Bank", "Annual fee 500", "Grocery Mart 1,250.00", "2"]] * 2)
+    assert [backend for _, _, backend in iter_pages_tiered(pdf)] == ['pypdf2', 'pypdf2']
+
+
+def test_tiered_extraction_reads_text_uploads():
+    upload = io.BytesIO(b"Processing fee 99\n")
+    assert list(iter_pages_tiered(upload)) == [(1, "Processing fee 99\n", 'text')]
+
+
+def test_iter_text_lines_matches_splitlines_across_chunk_boundaries(tmp_path):
+    text = "Annual fee ₹500\r\nFX markup 2.5% 😀\rSMS\x0calert ₹15\n\nlast line without break"
+    data = text.encode('utf-8')
+    for chunk_size in (1, 2, 3, 7, 1 << 20):
+        assert list(iter_text_lines(io.BytesIO(data), chunk_size)) == text.splitlines()
+
+    path = tmp_path / "statement.txt"
+    path.write_bytes(data)
+    assert list(iter_text_lines(str(path), chunk_size=5)) == text.splitlines()  # memory-mapped
+    (tmp_path / "empty.txt").write_bytes(b"")
+    assert list(iter_text_lines(str(tmp_path / "empty.txt"))) == []
+
+
+def test_streamed_text_detection_matches_whole_text(tmp_path):
+    text = "Opening balance ₹10,000\nLate payment penalty ₹700\n" * 50
+    path = tmp_path / "statement.txt"
+    path.write_bytes(text.encode('utf-8') + b"bad byte \xff fee 5%\n")
+
+    with open(path, 'rb') as fh:
+        expected = detect_fees_in_text(extract_text_from_pdf_or_text(fh))
+    with open(path, 'rb') as fh:
+        assert detect_fees_in_text_file(fh, chunk_size=64) == expected
+
+
+def test_pdf_fees_carry_page_and_line_numbers():
+    pdf = make_pdf([["Opening balance 1,000", "Grocery 250"], ["Closing balance 750", "Annual fee 500"]])
+
+    fees = detect_fees_in_pdf(pdf)
+    assert [(f['page'], f['line_no'], f['value']) for f in fees] == [(2, 2, 500.0)]
+    assert detect_fees_in_pdf(pdf, tiered=True) == fees
+
+
+def test_prefilter_skips_layout_on_fee_free_pages(caplog):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    c.drawString(50, 800, "Grocery Mart 1,250")
+    c.showPage()
+    # kerned fragments and text inside a form XObject still count
+    c._code.append('BT /F1 12 Tf 50 800 Td [(Ann) 20 (ual f) -10 (ee 499)] TJ ET')
+    c.showPage()
+    c.beginForm('summary')
+    c.drawString(50, 700, "Late payment penalty 750")
+    c.endForm()
+    c.doForm('summary')
+    c.showPage()
+    c.save()
+
+    pdf = pdfplumber.open(io.BytesIO(buf.getvalue()))
+    assert [page_may_have_fees(p) for p in pdf.pages] == [False, True, True]
+    pdf.close()
+
+    buf.seek(0)
+    with tracing() as tracer, caplog.at_level(logging.INFO, logger='src.pdf_parser'):
+        pages = list(iter_pages(buf, prefilter=True))
+    assert [text for _, text in pages] == ["", "Annual fee 499", "Late payment penalty 750"]
+    assert tracer.totals()[0]['stage'] == 'prefilter' and tracer.totals()[0]['items'] == 1
+    assert "skipped 1 of 3 page(s)" in caplog.text
+
+    with tracing() as tracer:
+        texts = extract_pages_parallel(buf.getvalue(), workers=2, min_pages=1, prefilter=True)
+    assert texts == [text for _, text in pages]
+    assert [(t['stage'], t['items']) for t in tracer.totals()] == [('prefilter', 1)]
+    assert detect_fees_in_pdf(buf, prefilter=True) == detect_fees_in_pdf(buf)
+
+
+def test_prefilter_decodes_strings_through_the_fonts(monkeypatch):
+    pdfmetrics.registerFont(TTFont('Vera', 'Vera.ttf'))
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for text in ["Grocery 250", "Annual fee 500"]:
+        c.setFont('Vera', 12)  # embedded subset with a ToUnicode map
+        c.drawString(50, 800, text)
+        c.showPage()
+    c.drawString(50, 800, "Card xee 500")
+    c.showPage()
+    c.save()
+
+    def open_pdf():
+        return pdfplumber.open(io.BytesIO(buf.getvalue()))
+
+    with open_pdf() as pdf:
+        assert [page_may_have_fees(p) for p in pdf.pages] == [False, True, False]
+    with open_pdf() as pdf:
+        # remapped codes are read as the letters they draw: "Card fee 500"
+        font = resolve1(resolve1(pdf.pages[2].page_obj.resources['Font'])['F1'])
+        font['Encoding'] = {'Differences': [ord('x'), LIT('f')]}
+        assert page_may_have_fees(pdf.pages[2])
+
+    def unmapped(self, cid):
+        raise PDFUnicodeNotDefined(None, cid)
+    monkeypatch.setattr(PDFSimpleFont, 'to_unichr', unmapped)
+    with open_pdf() as pdf:
+        assert page_may_have_fees(pdf.pages[0])
+
+
+def test_tiered_extraction_applies_the_prefilter():
+    pdf = make_pdf([["Annual fee 500"], ["Thank you for banking with us"]])
+    with tracing() as tracer:
+        pages = list(iter_pages_tiered(pdf, prefilter=True))
+    assert [(n, text, backend) for n, text, backend in pages][1] == (2, "", 'skipped')
+    assert [(t['stage'], t['items']) for t in tracer.totals()] == [('prefilter', 1)]
+
+
+def test_iter_text_lines_reads_pipes():
+    data = "Annual fee ₹500\r\nSMS alert ₹15 monthly\n".encode('utf-8') * 1000
+    read_fd, write_fd = os.pipe()
+    writer = threading.Thread(target=lambda: (os.write(write_fd, data), os.close(write_fd)))
+    writer.start()
+    with os.fdopen(read_fd, 'rb') as pipe:
+        lines = list(iter_text_lines(pipe, chunk_size=7))
+    writer.join()
+
+    assert lines == data.decode('utf-8').splitlines()
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from src.costs import annualize_fees
+from src.fee_detector import detect_fee_batch
+from src.summarizer import FeeReport, draft_complaint_email, render_fee_nutrition_label
+
+TEXT = """Online payment convenience fee ₹49 monthly
+Foreign transaction markup 3.5%
+Annual credit card fee ₹499
+Late payment penalty ₹750
+SMS alert ₹15 monthly
+Statement fee
+"""
+
+
+def make_report():
+    return FeeReport(annualize_fees(detect_fee_batch(TEXT), estimated_annual_txns=12))
+
+
+def test_report_views_match_the_fee_table():
+    report = make_report()
+    df = report.df
+    priced = df.dropna(subset=['annual_cost_estimate'])
+
+    assert report.count == 6
+    assert report.total == int(priced['annual_cost_estimate'].sum())
+    assert report.score == 100 - min(80, int(report.total / 20))
+    assert report.average == int(report.total / 6)
+    expected = priced.sort_values('annual_cost_estimate', ascending=False)
+    assert list(report.top(3)['line']) == list(expected['line'].head(3))
+    assert list(report.top(10)['line']) == list(expected['line'])
+    assert report.category_totals.to_dict() == priced.groupby('category', observed=True)['annual_cost_estimate'].sum().to_dict()
+
+
+def test_report_computes_each_view_once(monkeypatch):
+    report = make_report()
+    calls = []
+    real = pd.Series.nlargest
+    monkeypatch.setattr(pd.Series, 'nlargest', lambda self, *a, **k: calls.append(1) or real(self, *a, **k))
+
+    label = render_fee_nutrition_label(report)
+    email = draft_complaint_email(report)
+    report.top(5)
+
+    assert render_fee_nutrition_label(report) is label
+    assert calls == [1]  # one selection serves the label's top 3 and the email's and chart's top 5
+    assert "Late payment penalty" in email and "Late payment penalty" in label
+
+
+def test_report_without_annual_costs():
+    report = FeeReport(pd.DataFrame({'line': ['Statement fee']}))
+
+    assert (report.total, report.score, report.average) == (0, 100, 0)
+    assert report.top(5).empty and report.category_totals.empty
+    assert "Statement fee" in draft_complaint_email(report)
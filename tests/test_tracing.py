@@ -0,0 +1,38 @@
+import pstats
+
+from src.costs import annualize_fees
+from src.fee_detector import detect_fees_in_text
+from src.tracing import current_tracer, format_totals, traced, tracing
+
+TEXT = "Annual fee ₹500\nGrocery ₹250\nFX markup 2.5%\n"
+
+
+def test_pipeline_stages_are_recorded_only_inside_tracing():
+    detect_fees_in_text(TEXT)
+    assert current_tracer() is None
+
+    with tracing() as tracer:
+        fees = detect_fees_in_text(TEXT)
+        detect_fees_in_text(TEXT)
+        annualize_fees(fees)
+
+    assert current_tracer() is None
+    totals = {t['stage']: t for t in tracer.totals()}
+    assert totals['detect']['calls'] == 2 and totals['detect']['items'] == 4
+    assert totals['annualize']['items'] == 2
+    assert all(t['wall'] >= 0 and t['cpu'] >= 0 for t in totals.values())
+    assert format_totals(tracer.totals()).splitlines()[1].startswith('detect')
+
+
+def test_profile_run_dumps_loadable_stats(tmp_path):
+    @traced('custom', count=None)
+    def work():
+        return sum(range(1000))
+
+    path = tmp_path / 'run.prof'
+    with tracing(profile_path=str(path)) as tracer:
+        work()
+
+    assert tracer.records[0]['stage'] == 'custom' and tracer.records[0]['items'] is None
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == 'work' for func in stats.stats)